@@ -34,6 +34,20 @@ from app.db.base import Base
 import app.db.models
 target_metadata = Base.metadata
 
+# Database-side objects that are managed by hand-written migrations only and
+# must not be dropped by autogenerate
+UNMAPPED_COLUMNS = {("books", "search_vector")}
+UNMAPPED_INDEXES = {"ix_books_search_vector", "ix_books_book_name_trgm", "ix_books_author_trgm"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if reflected and compare_to is None:
+        if type_ == "column" and (object.table.name, name) in UNMAPPED_COLUMNS:
+            return False
+        if type_ == "index" and name in UNMAPPED_INDEXES:
+            return False
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -58,6 +72,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -79,7 +94,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,43 @@
+"""add book rating aggregates
+
+Revision ID: 3b1f6c2d9a47
+Revises: f2b60a8647ac
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '3b1f6c2d9a47'
+down_revision: Union[str, Sequence[str], None] = 'f2b60a8647ac'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+AGGREGATE_COLUMNS = (
+    'review_count',
+    'rating_sum',
+    'rating_1_count',
+    'rating_2_count',
+    'rating_3_count',
+    'rating_4_count',
+    'rating_5_count',
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    Existing books start at zero, run `python -m app.commands.backfill_ratings`
+    afterwards to compute their aggregates from the reviews table.
+    """
+    for column in AGGREGATE_COLUMNS:
+        op.add_column('books', sa.Column(column, sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in reversed(AGGREGATE_COLUMNS):
+        op.drop_column('books', column)
@@ -0,0 +1,29 @@
+"""add reviews book keyset indexes
+
+Revision ID: 7c4e9a1b2f60
+Revises: 3b1f6c2d9a47
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '7c4e9a1b2f60'
+down_revision: Union[str, Sequence[str], None] = '3b1f6c2d9a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_reviews_book_id_created_at_id', 'reviews', ['book_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_reviews_book_id_ratings_id', 'reviews', ['book_id', 'ratings', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reviews_book_id_ratings_id', table_name='reviews')
+    op.drop_index('ix_reviews_book_id_created_at_id', table_name='reviews')
@@ -0,0 +1,46 @@
+"""add books name author unique constraint
+
+Revision ID: a9d3e5f71c28
+Revises: 7c4e9a1b2f60
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a9d3e5f71c28'
+down_revision: Union[str, Sequence[str], None] = '7c4e9a1b2f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DUPLICATES = """
+    SELECT id, min(id) OVER (PARTITION BY book_name, author) AS keep_id
+    FROM books
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    Duplicate (book_name, author) rows are merged into the oldest one before the
+    constraint is created, run `python -m app.commands.backfill_ratings` afterwards
+    to recompute the rating aggregates of the merged books.
+    """
+    op.execute(f"""
+        UPDATE reviews SET book_id = duplicates.keep_id
+        FROM ({DUPLICATES}) AS duplicates
+        WHERE reviews.book_id = duplicates.id AND duplicates.id <> duplicates.keep_id
+    """)
+    op.execute(f"""
+        DELETE FROM books USING ({DUPLICATES}) AS duplicates
+        WHERE books.id = duplicates.id AND duplicates.id <> duplicates.keep_id
+    """)
+    op.create_unique_constraint('uq_books_book_name_author', 'books', ['book_name', 'author'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_books_book_name_author', 'books', type_='unique')
@@ -0,0 +1,40 @@
+"""add change feed
+
+Revision ID: b7f2a9c4e185
+Revises: e4d91b7a3c52
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b7f2a9c4e185'
+down_revision: Union[str, Sequence[str], None] = 'e4d91b7a3c52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_books_updated_at_id', 'books', ['updated_at', 'id'], unique=False)
+    op.create_index('ix_reviews_updated_at_id', 'reviews', ['updated_at', 'id'], unique=False)
+    op.create_table(
+        'tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('record_type', sa.String(), nullable=False),
+        sa.Column('record_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tombstones_deleted_at_id', 'tombstones', ['deleted_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tombstones_deleted_at_id', table_name='tombstones')
+    op.drop_table('tombstones')
+    op.drop_index('ix_reviews_updated_at_id', table_name='reviews')
+    op.drop_index('ix_books_updated_at_id', table_name='books')
@@ -0,0 +1,46 @@
+"""add books search
+
+Revision ID: c5b8d2e4f613
+Revises: a9d3e5f71c28
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c5b8d2e4f613'
+down_revision: Union[str, Sequence[str], None] = 'a9d3e5f71c28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("""
+        ALTER TABLE books ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple'::regconfig, coalesce(book_name, '')), 'A') ||
+            setweight(to_tsvector('simple'::regconfig, coalesce(author, '')), 'B') ||
+            setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'C')
+        ) STORED
+    """)
+    op.create_index('ix_books_search_vector', 'books', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index(
+        'ix_books_book_name_trgm', 'books', ['book_name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'book_name': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_books_author_trgm', 'books', ['author'], unique=False,
+        postgresql_using='gin', postgresql_ops={'author': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_author_trgm', table_name='books')
+    op.drop_index('ix_books_book_name_trgm', table_name='books')
+    op.drop_index('ix_books_search_vector', table_name='books')
+    op.drop_column('books', 'search_vector')
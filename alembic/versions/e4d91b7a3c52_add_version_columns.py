@@ -0,0 +1,29 @@
+"""add version columns
+
+Revision ID: e4d91b7a3c52
+Revises: c5b8d2e4f613
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'e4d91b7a3c52'
+down_revision: Union[str, Sequence[str], None] = 'c5b8d2e4f613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('reviews', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('reviews', 'version')
+    op.drop_column('books', 'version')
@@ -1,20 +1,53 @@
-from fastapi import APIRouter, status, Depends, Query
-from sqlalchemy import select, and_
-from sqlalchemy.orm import joinedload
+from fastapi import APIRouter, status, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, update, delete, and_, func, tuple_
 from app.core.config import settings
 from app.db.models.books import Books
 from app.db.models.reviews import Reviews
 from app.dependencies import get_db
-from app.utils.response import create_response
-from app.db.schema.books import CreateBooks, UpdateBooks
-from app.utils.cache import get_cached_data, set_cached_data
+from app.db.session import ReadSessionLocal
+from app.utils.response import create_response, cacheable_response, etag_for
+from app.db.schema.books import CreateBooks, UpdateBooks, BookResult, BookPage, BookReviewPage, BookSearchResults, BookBatchRequest, BookBatchResults, BookBulkDeleteRequest, BookBulkDeleteResults, BookLeaderboard, BookChanges
+from app.db.schema.response import ApiResponse
+from app.utils.cache import get_or_load, get_or_load_many, versioned_key, versioned_keys, tag_versions, write_through
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.ratings import avg_rating_expression, rating_summary
+from app.utils.bulk import BulkPayloadError, read_bulk_rows, validate_rows, chunked, dialect_insert
+from app.utils.invalidation import add_cache_tags, book_tags
+from app.utils.search import search_statement
+from app.utils.leaderboards import leaderboard_entries, leaderboard_from_db, record_book_removed
+from app.utils.cache_warming import record_access
+from app.utils.change_feed import load_changes, parse_cursor, cursor_values, cursor_expired, record_deletions
 import redis.asyncio as redis
+import csv
+import hashlib
+import io
 import logging
+import orjson
+from collections import Counter, defaultdict
 from datetime import datetime
+from functools import partial
+from typing import Literal, Union
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Fields that can be requested through the `fields` query param of the book listing
+BOOK_FIELDS = {
+    "id": Books.id,
+    "name": Books.book_name,
+    "author": Books.author,
+    "description": Books.description,
+    "language": Books.language,
+    "created_at": Books.created_at,
+    "updated_at": Books.updated_at,
+    "review_count": Books.review_count,
+    "avg_rating": avg_rating_expression,
+}
+DEFAULT_BOOK_FIELDS = ("id", "name", "author", "description", "language")
+# Fields that change whenever a review is written
+RATING_FIELDS = {"review_count", "avg_rating"}
+
 
 @router.post("/", summary="Api for entering book data")
 async def books(request: CreateBooks, db = Depends(get_db)):
@@ -23,10 +56,9 @@ async def books(request: CreateBooks, db = Depends(get_db)):
             Books.book_name == request.book_name,
             Books.author == request.author
         )))
-        print(query)
         book = query.scalars().first()
         if book:
-            return create_response(status.HTTP_200_OK, "Book is already present in db", data={"result": book})
+            return create_response(status.HTTP_200_OK, "Book is already present in db", data={"result": {"id": book.id, "book_name": book.book_name, "author": book.author}})
         
         book_data = Books(
             book_name = request.book_name,
@@ -44,91 +76,522 @@ async def books(request: CreateBooks, db = Depends(get_db)):
         return create_response(status.HTTP_500_INTERNAL_SERVER_ERROR, settings.INTERNAL_SERVER_ERROR, detail=str(err))
     
 
+@router.post("/bulk", summary="Api for entering many books at once, as a JSON array or NDJSON")
+async def bulk_books(request: Request, db = Depends(get_db)):
+    try:
+        try:
+            rows = await read_bulk_rows(request, settings.BULK_MAX_ROWS)
+        except BulkPayloadError as err:
+            return create_response(status.HTTP_400_BAD_REQUEST, str(err))
+
+        valid, results = validate_rows(rows, CreateBooks)
+        for chunk in chunked(valid, settings.BULK_CHUNK_SIZE):
+            # Rows repeating a (book_name, author) pair of the same chunk share its result
+            first_by_key = {}
+            for index, book in chunk:
+                first_by_key.setdefault((book.book_name, book.author), (index, book))
+
+            statement = (
+                dialect_insert(db, Books)
+                .values([book.model_dump() for _, book in first_by_key.values()])
+                .on_conflict_do_nothing(index_elements=["book_name", "author"])
+                .returning(Books.id, Books.book_name, Books.author)
+            )
+            query = await db.execute(statement)
+            created = {(row.book_name, row.author): row.id for row in query.all()}
+
+            existing = {}
+            missing = [key for key in first_by_key if key not in created]
+            if missing:
+                query = await db.execute(
+                    select(Books.id, Books.book_name, Books.author)
+                    .where(tuple_(Books.book_name, Books.author).in_(missing))
+                )
+                existing = {(row.book_name, row.author): row.id for row in query.all()}
+
+            if created:
+                add_cache_tags(db, "books")
+            await db.commit()
+
+            for index, book in chunk:
+                key = (book.book_name, book.author)
+                if key in created and first_by_key[key][0] == index:
+                    results.append({"index": index, "status": "created", "id": created[key]})
+                else:
+                    results.append({"index": index, "status": "exists", "id": created.get(key, existing.get(key))})
+
+        results.sort(key=lambda result: result["index"])
+        summary = Counter(result["status"] for result in results)
+        return create_response(status.HTTP_200_OK, "Books are processed", data={"result": results, "summary": summary})
+
+    except Exception as err:
+        logger.error("Error in bulk book data api %s", err)
+        return create_response(status.HTTP_500_INTERNAL_SERVER_ERROR, settings.INTERNAL_SERVER_ERROR, detail=str(err))
+
+
 @router.patch("/", summary="Api for updating book data")
 async def update_books(request: UpdateBooks, db = Depends(get_db)):
     try:
-        query = await db.execute(select(Books).where(Books.id == request.id))
+        update_data = request.model_dump(exclude_unset=True, exclude={"id", "version"})
+        values = {key: value for key, value in update_data.items() if value not in ("", None)}
+
+        statement = update(Books).where(Books.id == request.id).values(**values, version=Books.version + 1)
+        if request.version is not None:
+            statement = statement.where(Books.version == request.version)
+        cache_versions = await tag_versions([f"book:{request.id}"])
+        query = await db.execute(
+            statement.returning(Books),
+            execution_options={"synchronize_session": False},
+        )
         book = query.scalars().first()
         if not book:
-            return create_response(status.HTTP_404_NOT_FOUND, "Book is not found please enter this book data.")
-        
-        update_data = request.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            if value not in ("", None):
-                setattr(book, key, value)
+            query = await db.execute(select(Books.version).where(Books.id == request.id))
+            current_version = query.scalar()
+            if current_version is None:
+                return create_response(status.HTTP_404_NOT_FOUND, "Book is not found please enter this book data.")
+            return create_response(
+                status.HTTP_409_CONFLICT,
+                "Book was changed by another request, fetch it again",
+                data={"result": {"id": request.id, "version": current_version}}
+            )
 
+        # A PATCH leaves ratings and reviews alone, the rest of the cached payload still holds
+        book_fields = _book_fields(book)
+        tags = book_tags(book.id)
+        add_cache_tags(db, *tags)
         await db.commit()
+        await write_through(f"book:{request.id}", cache_versions, tags, book_fields)
 
-        return create_response(status.HTTP_200_OK, "Book is updated sucesfully")
+        return create_response(status.HTTP_200_OK, "Book is updated sucesfully", data={"result": book_fields})
 
     except Exception as err:
         logger.error("Error in updating book data api %s", err)
         return create_response(status.HTTP_500_INTERNAL_SERVER_ERROR, settings.INTERNAL_SERVER_ERROR, detail=str(err))
     
 
-@router.get("/", summary="API for getting book data")
-async def get_books(book_id: int = Query(None, description="If you want specific book data then enter book_id, or leave empty for all books"), db=Depends(get_db)):
+def _review_data(review) -> dict:
+    return {
+        "id": review.id,
+        "reviewer_name": review.reviewer_name,
+        "ratings": review.ratings,
+        "review": review.review,
+        "created_at": review.created_at,
+        "updated_at": review.updated_at,
+    }
+
+
+def _reviews_after(sort: str, cursor_values: dict):
+    """Keyset condition for the reviews that come after `cursor_values` in `sort` order."""
+    if sort == "rating":
+        return tuple_(Reviews.ratings, Reviews.id) < tuple_(int(cursor_values["ratings"]), int(cursor_values["id"]))
+    return tuple_(Reviews.created_at, Reviews.id) < tuple_(
+        datetime.fromisoformat(cursor_values["created_at"]), int(cursor_values["id"])
+    )
+
+
+def _review_cursor(sort: str, review) -> str:
+    if sort == "rating":
+        return encode_cursor({"ratings": review.ratings, "id": review.id})
+    return encode_cursor({"created_at": review.created_at.isoformat(), "id": review.id})
+
+
+async def _load_reviews_page(db, book_id: int, sort: str, cursor_values, limit: int):
+    order_by = (Reviews.ratings.desc(), Reviews.id.desc()) if sort == "rating" else (Reviews.created_at.desc(), Reviews.id.desc())
+    statement = select(Reviews).where(Reviews.book_id == book_id).order_by(*order_by).limit(limit + 1)
+    if cursor_values:
+        statement = statement.where(_reviews_after(sort, cursor_values))
+
+    query = await db.execute(statement)
+    reviews = query.scalars().all()
+    if not reviews and not cursor_values:
+        query = await db.execute(select(Books.id).where(Books.id == book_id))
+        if query.scalar() is None:
+            return None
+
+    next_cursor = _review_cursor(sort, reviews[limit - 1]) if len(reviews) > limit else None
+    return {"result": [_review_data(review) for review in reviews[:limit]], "next_cursor": next_cursor}
+
+
+def _book_fields(book) -> dict:
+    return {
+        "id": book.id,
+        "name": book.book_name,
+        "author": book.author,
+        "language": book.language,
+        "description": book.description,
+        "created_at": book.created_at,
+        "updated_at": book.updated_at,
+        "version": book.version,
+    }
+
+
+def _book_data(book, reviews) -> dict:
+    """Cached payload of a single book; `reviews` are its newest reviews, one more
+    than the preview size when there are further pages."""
+    preview = reviews[:settings.REVIEW_PREVIEW_SIZE]
+    next_cursor = _review_cursor("newest", preview[-1]) if len(reviews) > settings.REVIEW_PREVIEW_SIZE else None
+    return {
+        **_book_fields(book),
+        **rating_summary(book),
+        "reviews": [_review_data(review) for review in preview],
+        "reviews_next_cursor": next_cursor,
+    }
+
+
+async def _load_books(db, book_ids) -> dict:
+    """Payloads of the existing books among `book_ids`, keyed by id, in two queries:
+    the books themselves, then the newest reviews of each one through a window function."""
+    query = await db.execute(select(Books).where(Books.id.in_(book_ids)))
+    books = query.scalars().all()
+    if not books:
+        return {}
+
+    newest_first = (Reviews.created_at.desc(), Reviews.id.desc())
+    ranked = (
+        select(Reviews.id, func.row_number().over(partition_by=Reviews.book_id, order_by=newest_first).label("position"))
+        .where(Reviews.book_id.in_([book.id for book in books]))
+        .subquery()
+    )
+    query = await db.execute(
+        select(Reviews)
+        .join(ranked, Reviews.id == ranked.c.id)
+        .where(ranked.c.position <= settings.REVIEW_PREVIEW_SIZE + 1)
+        .order_by(Reviews.book_id, *newest_first)
+    )
+    previews = defaultdict(list)
+    for review in query.scalars():
+        previews[review.book_id].append(review)
+    return {book.id: _book_data(book, previews[book.id]) for book in books}
+
+
+async def _load_book(db, book_id: int):
+    return (await _load_books(db, [book_id])).get(book_id)
+
+
+async def load_cached_books(db, book_ids: list):
+    """Cached payloads of `book_ids`, loading the missing ones in one go. Shares its
+    entries with the single book lookup. Returns `(payloads by id, cached_count)`."""
+    cache_keys = await versioned_keys([(f"book:{book_id}", (f"book:{book_id}",)) for book_id in book_ids])
+    return await get_or_load_many(dict(zip(book_ids, cache_keys)), partial(_load_books, db))
+
+
+def _field_value(value):
+    if isinstance(value, float):
+        return round(value, 2)
+    return value
+
+
+async def _load_books_page(db, after_id: int, limit: int, selected: list):
+    query = await db.execute(
+        select(*(BOOK_FIELDS[field].label(field) for field in selected))
+        .where(Books.id > after_id)
+        .order_by(Books.id)
+        .limit(limit + 1)
+    )
+    rows = query.all()
+
+    books_data = [
+        {
+            key: _field_value(value)
+            for key, value in row._mapping.items()
+        } for row in rows[:limit]
+    ]
+    next_cursor = encode_cursor({"id": books_data[-1]["id"]}) if len(rows) > limit else None
+    return {"result": books_data, "next_cursor": next_cursor}
+
+
+# Columns written by the catalogue export, in output order
+EXPORT_BOOK_COLUMNS = {
+    "id": Books.id,
+    "name": Books.book_name,
+    "author": Books.author,
+    "description": Books.description,
+    "language": Books.language,
+    "review_count": Books.review_count,
+    "avg_rating": avg_rating_expression,
+    "created_at": Books.created_at,
+    "updated_at": Books.updated_at,
+}
+EXPORT_REVIEW_COLUMNS = {
+    "review_id": Reviews.id,
+    "reviewer_name": Reviews.reviewer_name,
+    "ratings": Reviews.ratings,
+    "review": Reviews.review,
+    "review_created_at": Reviews.created_at,
+    "review_updated_at": Reviews.updated_at,
+}
+
+
+async def _stream_export_rows(include_reviews: bool):
+    """Yield batches of catalogue rows from a server-side cursor.
+
+    The export opens its own session because it outlives the request handler, and
+    reads from the replica when one is configured.
+    """
+    columns = {**EXPORT_BOOK_COLUMNS, **(EXPORT_REVIEW_COLUMNS if include_reviews else {})}
+    statement = select(*(column.label(name) for name, column in columns.items()))
+    if include_reviews:
+        statement = statement.outerjoin(Reviews, Reviews.book_id == Books.id).order_by(Books.id, Reviews.created_at, Reviews.id)
+    else:
+        statement = statement.order_by(Books.id)
+
+    async with ReadSessionLocal() as db:
+        result = await db.stream(statement.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        async for partition in result.mappings().partitions():
+            yield [{key: _field_value(value) for key, value in row.items()} for row in partition]
+
+
+async def _export_ndjson(include_reviews: bool):
+    book = None
+    async for rows in _stream_export_rows(include_reviews):
+        lines = []
+        for row in rows:
+            if not include_reviews:
+                lines.append(orjson.dumps(row))
+                continue
+            if book is None or book["id"] != row["id"]:
+                if book is not None:
+                    lines.append(orjson.dumps(book))
+                book = {name: row[name] for name in EXPORT_BOOK_COLUMNS}
+                book["reviews"] = []
+            if row["review_id"] is not None:
+                book["reviews"].append({name: row[name] for name in EXPORT_REVIEW_COLUMNS})
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+    if book is not None:
+        yield orjson.dumps(book) + b"\n"
+
+
+async def _export_csv(include_reviews: bool):
+    columns = [*EXPORT_BOOK_COLUMNS, *(EXPORT_REVIEW_COLUMNS if include_reviews else ())]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    async for rows in _stream_export_rows(include_reviews):
+        writer.writerows(
+            {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+            for row in rows
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@router.get("/export", summary="API for streaming the whole catalogue as NDJSON or CSV")
+async def export_books(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="ndjson (one book per line) or csv"),
+    include_reviews: bool = Query(False, description="Also export the reviews of every book"),
+):
+    if format == "csv":
+        return StreamingResponse(
+            _export_csv(include_reviews),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="books.csv"'}
+        )
+    return StreamingResponse(
+        _export_ndjson(include_reviews),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="books.ndjson"'}
+    )
+
+
+async def _load_search_results(db, text: str, mode: str, limit: int):
+    query = await db.execute(search_statement(db.bind.dialect.name, text, mode, limit))
+    return {"result": [{key: _field_value(value) for key, value in row._mapping.items()} for row in query.all()]}
+
+
+@router.get("/search", summary="API for searching books by name, author and description", response_model=ApiResponse[BookSearchResults])
+async def search_books(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Search text"),
+    mode: Literal["fulltext", "prefix"] = Query("fulltext", description="fulltext for ranked search, prefix for typo tolerant autocomplete"),
+    limit: int = Query(settings.SEARCH_PAGE_SIZE, ge=1, le=settings.SEARCH_MAX_PAGE_SIZE, description="Number of results"),
+    db=Depends(get_db)
+):
     try:
-        if book_id:
-            cache_key = f"book:{book_id}"
-            cached_book = await get_cached_data(cache_key)
-            if cached_book:
-                return create_response(status.HTTP_200_OK, "Book fetched from cache", data={"result": cached_book})
-
-            query = await db.execute(
-                select(Books)
-                .options(joinedload(Books.reviews))
-                .where(Books.id == book_id)
-            )
-            book = query.scalars().first()
+        text = " ".join(q.split())
+        if not text:
+            return create_response(status.HTTP_400_BAD_REQUEST, "Search text is empty")
 
-            if not book:
-                return create_response(status.HTTP_404_NOT_FOUND, "Book not found for the given ID")
+        digest = hashlib.sha1(text.lower().encode()).hexdigest()
+        cache_key = await versioned_key(f"books:search:{mode}:{limit}:{digest}", "books")
+        results, from_cache = await get_or_load(cache_key, partial(_load_search_results, db, text, mode, limit))
+
+        message = "Books fetched from cache" if from_cache else "Books fetched from database"
+        return cacheable_response(request, message, orjson.Fragment(results), etag_for(results))
+
+    except Exception as err:
+        logger.error("Error in book search API: %s", err)
+        return create_response(status.HTTP_500_INTERNAL_SERVER_ERROR, settings.INTERNAL_SERVER_ERROR, detail=str(err))
 
-            book_data = {
-                "id": book.id,
-                "name": book.book_name,
-                "author": book.author,
-                "language": book.language,
-                "description": book.description,
-                "created_at": book.created_at.isoformat() if isinstance(book.created_at, datetime) else None,
-                "updated_at": book.updated_at.isoformat() if isinstance(book.updated_at, datetime) else None,
-                "reviews": [
-                    {
-                        "id": review.id,
-                        "ratings": review.ratings,
-                        "review": review.review,
-                        "created_at": review.created_at.isoformat() if isinstance(review.updated_at, datetime) else None,
-                        "updated_at": review.updated_at.isoformat() if isinstance(review.updated_at, datetime) else None,
-                    }
-                    for review in book.reviews
-                ]
-            }
 
-            await set_cached_data(cache_key, book_data)
-            return create_response(status.HTTP_200_OK, "Book fetched from database", data={"result": book_data})
+def _parse_book_ids(ids: str) -> list:
+    return [int(book_id) for book_id in ids.split(",") if book_id.strip()]
 
 
-        cache_key = "books:all"
-        cached_books = await get_cached_data(cache_key)
-        if cached_books:
-            return create_response(status.HTTP_200_OK, "Books fetched from cache", data={"result": cached_books})
+async def _books_batch(db, book_ids: list, request: Request = None):
+    book_ids = list(dict.fromkeys(book_ids))
+    if not book_ids:
+        return create_response(status.HTTP_400_BAD_REQUEST, "No book ids given")
+    if len(book_ids) > settings.BOOKS_BATCH_MAX_IDS:
+        return create_response(status.HTTP_400_BAD_REQUEST, f"At most {settings.BOOKS_BATCH_MAX_IDS} book ids can be fetched at once")
 
-        query = await db.execute(select(Books))
-        books = query.scalars().all()
+    record_access(book_ids)
+    books_data, cached_count = await load_cached_books(db, book_ids)
 
-        books_data = [
-            {
-                "id": book.id,
-                "name": book.book_name,
-                "author": book.author,
-                "description": book.description,
-                "language": book.language
-            } for book in books
-        ]
+    result = [
+        {"id": book_id, "found": True, "book": orjson.Fragment(books_data[book_id])} if book_id in books_data
+        else {"id": book_id, "found": False, "book": None}
+        for book_id in book_ids
+    ]
+    missing = [book_id for book_id in book_ids if book_id not in books_data]
+    message = f"{len(books_data)} books fetched, {cached_count} from cache"
+    data = {"result": result, "missing": missing}
+    if request is None:
+        return create_response(status.HTTP_200_OK, message, data=data)
+    etag = etag_for(*(part for book_id in book_ids for part in (str(book_id).encode(), books_data.get(book_id, b""))))
+    return cacheable_response(request, message, data, etag)
 
-        await set_cached_data(cache_key, books_data)
-        return create_response(status.HTTP_200_OK, "Books fetched from database", data={"result": books_data})
+
+@router.get("/batch", summary="API for getting many books by id in one request", response_model=ApiResponse[BookBatchResults])
+async def get_books_batch(
+    request: Request,
+    ids: str = Query(..., description="Comma separated book ids, e.g. 1,2,3"),
+    db=Depends(get_db)
+):
+    try:
+        try:
+            book_ids = _parse_book_ids(ids)
+        except ValueError:
+            return create_response(status.HTTP_400_BAD_REQUEST, "ids must be a comma separated list of integers")
+        return await _books_batch(db, book_ids, request)
+
+    except Exception as err:
+        logger.error("Error in book batch API: %s", err)
+        return create_response(status.HTTP_500_INTERNAL_SERVER_ERROR, settings.INTERNAL_SERVER_ERROR, detail=str(err))
+
+
+@router.post("/batch", summary="API for getting many books by id, for id lists too long for a query string", response_model=ApiResponse[BookBatchResults])
+async def post_books_batch(request: BookBatchRequest, db=Depends(get_db)):
+    try:
+        return await _books_batch(db, request.ids)
+
+    except Exception as err:
+        logger.error("Error in book batch API: %s", err)
+        return create_response(status.HTTP_500_INTERNAL_SERVER_ERROR, settings.INTERNAL_SERVER_ERROR, detail=str(err))
+
+
+async def _leaderboard(request: Request, db, board: str, limit: int):
+    entries = await leaderboard_entries(board, limit)
+    source = "cache"
+    if entries is None:
+        entries = await leaderboard_from_db(db, board, limit)
+        source = "database"
+
+    book_ids = [book_id for book_id, _ in entries]
+    books_data, _ = await load_cached_books(db, book_ids)
+
+    # Books deleted since the leaderboard was updated are left out
+    ranked = [(book_id, round(score, 4)) for book_id, score in entries if book_id in books_data]
+    result = [
+        {"rank": rank, "score": score, "book": orjson.Fragment(books_data[book_id])}
+        for rank, (book_id, score) in enumerate(ranked, 1)
+    ]
+    etag = etag_for(*(part for book_id, score in ranked for part in (f"{book_id}:{score}".encode(), books_data[book_id])))
+    return cacheable_response(request, f"Leaderboard fetched from {source}", {"result": result}, etag)
+
+
+@router.get("/changes", summary="API for the books and reviews changed since a cursor, deletions included", response_model=ApiResponse[BookChanges])
+async def book_changes(
+    since: str = Query(None, description="next_cursor returned by the previous call, leave empty to start from the beginning"),
+    limit: int = Query(settings.CHANGES_PAGE_SIZE, ge=1, le=settings.CHANGES_MAX_PAGE_SIZE, description="Number of changes"),
+    db=Depends(get_db)
+):
+    try:
+        try:
+            cursor = parse_cursor(decode_cursor(since) if since else {})
+        except (ValueError, TypeError, IndexError):
+            return create_response(status.HTTP_400_BAD_REQUEST, "Invalid cursor")
+        if cursor_expired(cursor):
+            return create_response(status.HTTP_410_GONE, "Cursor is too old, sync again from the beginning")
+
+        changes, cursor, has_more = await load_changes(db, cursor, limit)
+        data = {"result": changes, "next_cursor": encode_cursor(cursor_values(cursor)), "has_more": has_more}
+        return create_response(status.HTTP_200_OK, f"{len(changes)} changes fetched", data=data)
+
+    except Exception as err:
+        logger.error("Error in book changes API: %s", err)
+        return create_response(status.HTTP_500_INTERNAL_SERVER_ERROR, settings.INTERNAL_SERVER_ERROR, detail=str(err))
+
+
+@router.get("/top-rated", summary="API for the best rated books", response_model=ApiResponse[BookLeaderboard])
+async def top_rated_books(
+    request: Request,
+    limit: int = Query(settings.LEADERBOARD_PAGE_SIZE, ge=1, le=settings.LEADERBOARD_MAX_SIZE, description="Number of books"),
+    db=Depends(get_db)
+):
+    try:
+        return await _leaderboard(request, db, "top_rated", limit)
+
+    except Exception as err:
+        logger.error("Error in top rated books API: %s", err)
+        return create_response(status.HTTP_500_INTERNAL_SERVER_ERROR, settings.INTERNAL_SERVER_ERROR, detail=str(err))
+
+
+@router.get("/trending", summary="API for the most reviewed books of the last days, recent reviews counting more", response_model=ApiResponse[BookLeaderboard])
+async def trending_books(
+    request: Request,
+    limit: int = Query(settings.LEADERBOARD_PAGE_SIZE, ge=1, le=settings.LEADERBOARD_MAX_SIZE, description="Number of books"),
+    db=Depends(get_db)
+):
+    try:
+        return await _leaderboard(request, db, "trending", limit)
+
+    except Exception as err:
+        logger.error("Error in trending books API: %s", err)
+        return create_response(status.HTTP_500_INTERNAL_SERVER_ERROR, settings.INTERNAL_SERVER_ERROR, detail=str(err))
+
+
+@router.get("/", summary="API for getting book data", response_model=ApiResponse[Union[BookResult, BookPage]])
+async def get_books(
+    request: Request,
+    book_id: int = Query(None, description="If you want specific book data then enter book_id, or leave empty for a page of books"),
+    cursor: str = Query(None, description="next_cursor returned by the previous page, leave empty for the first page"),
+    limit: int = Query(settings.BOOKS_PAGE_SIZE, ge=1, le=settings.BOOKS_MAX_PAGE_SIZE, description="Number of books per page"),
+    fields: str = Query(None, description="Comma separated list of fields to return for each book, e.g. id,name,author"),
+    db=Depends(get_db)
+):
+    try:
+        if book_id:
+            record_access([book_id])
+            cache_key = await versioned_key(f"book:{book_id}", f"book:{book_id}")
+            book_data, from_cache = await get_or_load(cache_key, partial(_load_book, db, book_id))
+            if book_data is None:
+                return create_response(status.HTTP_404_NOT_FOUND, "Book not found for the given ID")
+
+            message = "Book fetched from cache" if from_cache else "Book fetched from database"
+            return cacheable_response(request, message, {"result": orjson.Fragment(book_data)}, etag_for(book_data))
+
+        try:
+            after_id = int(decode_cursor(cursor)["id"]) if cursor else 0
+        except (ValueError, KeyError, TypeError):
+            return create_response(status.HTTP_400_BAD_REQUEST, "Invalid cursor")
+
+        selected = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip())) if fields else list(DEFAULT_BOOK_FIELDS)
+        unknown = [field for field in selected if field not in BOOK_FIELDS]
+        if unknown:
+            return create_response(status.HTTP_400_BAD_REQUEST, f"Unknown fields: {', '.join(unknown)}")
+        if "id" not in selected:
+            selected.insert(0, "id")
+
+        tags = ("books", "ratings") if RATING_FIELDS.intersection(selected) else ("books",)
+        cache_key = await versioned_key(f"books:page:{after_id}:{limit}:{','.join(selected)}", *tags)
+        page, from_cache = await get_or_load(cache_key, partial(_load_books_page, db, after_id, limit, selected))
+
+        message = "Books fetched from cache" if from_cache else "Books fetched from database"
+        return cacheable_response(request, message, orjson.Fragment(page), etag_for(page))
 
     except Exception as err:
         logger.error("Error in /books API: %s", err)
@@ -140,15 +603,89 @@ async def get_books(book_id: int = Query(None, description="If you want specific
     
 
 
+@router.get("/{book_id}/reviews", summary="API for getting the reviews of a book page by page", response_model=ApiResponse[BookReviewPage])
+async def get_book_reviews(
+    request: Request,
+    book_id: int,
+    sort: Literal["newest", "rating"] = Query("newest", description="newest first, or highest rating first"),
+    cursor: str = Query(None, description="next_cursor returned by the previous page, leave empty for the first page"),
+    limit: int = Query(settings.REVIEWS_PAGE_SIZE, ge=1, le=settings.REVIEWS_MAX_PAGE_SIZE, description="Number of reviews per page"),
+    db=Depends(get_db)
+):
+    try:
+        try:
+            cursor_values = decode_cursor(cursor) if cursor else None
+            if cursor_values:
+                _reviews_after(sort, cursor_values)
+        except (ValueError, KeyError, TypeError):
+            return create_response(status.HTTP_400_BAD_REQUEST, "Invalid cursor")
+
+        cache_key = await versioned_key(f"book:{book_id}:reviews:{sort}:{cursor or ''}:{limit}", f"book:{book_id}:reviews")
+        page, from_cache = await get_or_load(cache_key, partial(_load_reviews_page, db, book_id, sort, cursor_values, limit))
+        if page is None:
+            return create_response(status.HTTP_404_NOT_FOUND, "Book not found for the given ID")
+
+        message = "Reviews fetched from cache" if from_cache else "Reviews fetched from database"
+        return cacheable_response(request, message, orjson.Fragment(page), etag_for(page))
+
+    except Exception as err:
+        logger.error("Error in book reviews API: %s", err)
+        return create_response(status.HTTP_500_INTERNAL_SERVER_ERROR, settings.INTERNAL_SERVER_ERROR, detail=str(err))
+
+
+
+async def _delete_books(db, book_ids: list) -> list:
+    """Delete `book_ids` with one DELETE ... RETURNING per chunk. Their reviews go
+    with them through the ON DELETE CASCADE foreign key, without being loaded, so
+    the cache tags are recorded here rather than by the flush hooks."""
+    deleted = []
+    for chunk in chunked(book_ids, settings.BULK_CHUNK_SIZE):
+        query = await db.execute(
+            delete(Books).where(Books.id.in_(chunk)).returning(Books.id),
+            execution_options={"synchronize_session": False},
+        )
+        deleted.extend(query.scalars().all())
+
+    tags = set()
+    for book_id in deleted:
+        tags |= book_tags(book_id)
+        record_book_removed(db, book_id)
+    add_cache_tags(db, *tags)
+    await record_deletions(db, "book", deleted)
+    return deleted
+
+
+@router.post("/bulk-delete", summary="Api for deleting many books, and their reviews, at once", response_model=ApiResponse[BookBulkDeleteResults])
+async def bulk_delete_books(request: BookBulkDeleteRequest, db=Depends(get_db)):
+    try:
+        book_ids = list(dict.fromkeys(request.ids))
+        if not book_ids:
+            return create_response(status.HTTP_400_BAD_REQUEST, "No book ids given")
+        if len(book_ids) > settings.BULK_DELETE_MAX_IDS:
+            return create_response(status.HTTP_400_BAD_REQUEST, f"At most {settings.BULK_DELETE_MAX_IDS} books can be deleted at once")
+
+        deleted = await _delete_books(db, book_ids)
+        await db.commit()
+
+        deleted_ids = set(deleted)
+        data = {
+            "result": {
+                "deleted": [book_id for book_id in book_ids if book_id in deleted_ids],
+                "missing": [book_id for book_id in book_ids if book_id not in deleted_ids],
+            }
+        }
+        return create_response(status.HTTP_200_OK, f"{len(deleted)} books deleted", data=data)
+
+    except Exception as err:
+        logger.error("Error in bulk book delete API: %s", err)
+        return create_response(status.HTTP_500_INTERNAL_SERVER_ERROR, settings.INTERNAL_SERVER_ERROR, detail=str(err))
+
+
 @router.delete("/", summary="Api for deleting book data")
 async def books(book_id:int = Query(..., description="book_id to delete a particular book"), db = Depends(get_db)):
     try:
-        query = await db.execute(select(Books).where(Books.id == book_id))
-        book = query.scalars().first()  
-        if not book:
+        if not await _delete_books(db, [book_id]):
             return create_response(status.HTTP_404_NOT_FOUND, "Book is not found please enter this book data.")
-        
-        await db.delete(book)
 
         await db.commit()
 
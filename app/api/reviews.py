@@ -1,22 +1,53 @@
-from fastapi import APIRouter, status, Depends, Query
-from sqlalchemy import select
+from fastapi import APIRouter, status, Depends, Query, Request
+from sqlalchemy import select, update, delete
 from sqlalchemy.orm import joinedload
 from app.core.config import settings
 from app.db.models.reviews import Reviews
 from app.db.models.books import Books
 from app.dependencies import get_db
-from app.utils.response import create_response
-from app.db.schema.reviews import PostReviews, UpdateReviews
+from app.utils.response import create_response, cacheable_response, etag_for
+from app.db.schema.reviews import PostReviews, UpdateReviews, ReviewResult
+from app.db.schema.response import ApiResponse
+from app.utils.ratings import apply_rating_change
+from app.utils.leaderboards import record_reviews
+from app.utils.bulk import BulkPayloadError, read_bulk_rows, validate_rows, chunked
+from app.utils.review_ingest import insert_reviews, review_queue
+from app.utils.cache import get_or_load, get_cached_data, versioned_key, tag_versions, write_through
+from app.utils.invalidation import add_cache_tags, review_tags
+from app.utils.change_feed import record_deletions
 import logging
-from datetime import datetime
+import orjson
+from functools import partial
+from collections import Counter
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+async def _book_exists(db, book_id: int) -> bool:
+    # The book's cached entry is dropped when it is deleted, so a hit is enough
+    cache_key = await versioned_key(f"book:{book_id}", f"book:{book_id}")
+    if await get_cached_data(cache_key) is not None:
+        return True
+    query = await db.execute(select(Books.id).where(Books.id == book_id))
+    return query.scalar_one_or_none() is not None
+
+
 @router.post("/", summary="Api for posting reviews on book data")
 async def post_reviews(request: PostReviews, db = Depends(get_db)):
     try:
+        if not await _book_exists(db, request.book_id):
+            return create_response(status.HTTP_404_NOT_FOUND, "Book not found for the given ID")
+
+        if settings.REVIEW_QUEUE_ENABLED:
+            if not review_queue.submit(request):
+                return create_response(
+                    status.HTTP_503_SERVICE_UNAVAILABLE,
+                    "Review queue is full, retry later",
+                    headers={"Retry-After": str(settings.REVIEW_QUEUE_RETRY_AFTER)}
+                )
+            return create_response(status.HTTP_202_ACCEPTED, "Review is accepted and will be posted shortly")
+
         review_data = Reviews(
             book_id = request.book_id,
             ratings = request.ratings,
@@ -24,6 +55,8 @@ async def post_reviews(request: PostReviews, db = Depends(get_db)):
             reviewer_name = request.reviewer_name
         )
         db.add(review_data)
+        await apply_rating_change(db, request.book_id, added=[request.ratings])
+        record_reviews(db, request.book_id)
         await db.commit()
 
         return create_response(status.HTTP_200_OK, "Review is posted sucesfully")
@@ -33,58 +66,166 @@ async def post_reviews(request: PostReviews, db = Depends(get_db)):
         return create_response(status.HTTP_500_INTERNAL_SERVER_ERROR, settings.INTERNAL_SERVER_ERROR, detail=str(err))
     
 
+@router.post("/bulk", summary="Api for posting many reviews at once, as a JSON array or NDJSON")
+async def bulk_reviews(request: Request, db = Depends(get_db)):
+    try:
+        try:
+            rows = await read_bulk_rows(request, settings.BULK_MAX_ROWS)
+        except BulkPayloadError as err:
+            return create_response(status.HTTP_400_BAD_REQUEST, str(err))
+
+        valid, results = validate_rows(rows, PostReviews)
+        for chunk in chunked(valid, settings.BULK_CHUNK_SIZE):
+            review_ids = await insert_reviews(db, [review for _, review in chunk])
+            await db.commit()
+
+            results.extend(
+                {"index": index, "status": "created", "id": review_id} if review_id is not None
+                else {"index": index, "status": "invalid", "error": "Book not found for the given ID"}
+                for (index, _), review_id in zip(chunk, review_ids)
+            )
+
+        results.sort(key=lambda result: result["index"])
+        summary = Counter(result["status"] for result in results)
+        return create_response(status.HTTP_200_OK, "Reviews are processed", data={"result": results, "summary": summary})
+
+    except Exception as err:
+        logger.error("Error in bulk review api %s", err)
+        return create_response(status.HTTP_500_INTERNAL_SERVER_ERROR, settings.INTERNAL_SERVER_ERROR, detail=str(err))
+
+
 @router.patch("/", summary="Api for updating reviews")
 async def update_review(request: UpdateReviews, db = Depends(get_db)):
     try:
-        query = await db.execute(select(Reviews).where(Reviews.id == request.review_id))
-        review = query.scalars().first()
-        if not review:
-            return create_response(status.HTTP_404_NOT_FOUND, "Book review is not found")
-        
-        update_data = request.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            if value not in ("", None):
-                setattr(review, key, value)
+        update_data = request.model_dump(exclude_unset=True, exclude={"review_id", "version"})
+        values = {key: value for key, value in update_data.items() if value not in ("", None)}
+
+        statement = update(Reviews).values(**values, version=Reviews.version + 1)
+        if request.version is not None:
+            statement = statement.where(Reviews.version == request.version)
+
+        previous_ratings = None
+        returned = [Reviews]
+        if "ratings" in values and db.bind.dialect.name == "postgresql":
+            # RETURNING only sees the new row: the old rating comes from a locked
+            # sub-select in the same statement, so concurrent rating changes can't
+            # skew the aggregates
+            previous = (
+                select(Reviews.id, Reviews.ratings)
+                .where(Reviews.id == request.review_id)
+                .with_for_update()
+                .subquery("previous")
+            )
+            statement = statement.where(Reviews.id == previous.c.id)
+            returned.append(previous.c.ratings)
+        else:
+            if "ratings" in values:
+                # Other databases can't lock in a sub-select: read the old rating first
+                query = await db.execute(select(Reviews.ratings).where(Reviews.id == request.review_id).with_for_update())
+                previous_ratings = query.scalar()
+            statement = statement.where(Reviews.id == request.review_id)
+
+        query = await db.execute(
+            statement.returning(*returned),
+            execution_options={"synchronize_session": False},
+        )
+        row = query.first()
+        if not row:
+            query = await db.execute(select(Reviews.version).where(Reviews.id == request.review_id))
+            current_version = query.scalar()
+            if current_version is None:
+                return create_response(status.HTTP_404_NOT_FOUND, "Book review is not found")
+            return create_response(
+                status.HTTP_409_CONFLICT,
+                "Review was changed by another request, fetch it again",
+                data={"result": {"id": request.review_id, "version": current_version}}
+            )
 
+        review = row[0]
+        if len(row) > 1:
+            previous_ratings = row[1]
+        # Tags are only bumped on commit and the row stays locked until then, so
+        # these are still the versions the cached entry was written under
+        cache_versions = await tag_versions([f"review:{review.id}", f"book:{review.book_id}"])
+        review_fields = _review_fields(review)
+        rating_changed = previous_ratings is not None and review.ratings != previous_ratings
+        if rating_changed:
+            await apply_rating_change(db, review.book_id, added=[review.ratings], removed=[previous_ratings])
+        tags = review_tags(review.book_id, review.id)
+        add_cache_tags(db, *tags)
         await db.commit()
+        # A rating change also updated the embedded book, which is then reloaded
+        if not rating_changed:
+            await write_through(f"review:{request.review_id}", cache_versions, tags, review_fields)
 
-        return create_response(status.HTTP_200_OK, "Review is updated sucesfully")
+        return create_response(status.HTTP_200_OK, "Review is updated sucesfully", data={"result": review_fields})
 
     except Exception as err:
         logger.error("Error in updating review api %s", err)
         return create_response(status.HTTP_500_INTERNAL_SERVER_ERROR, settings.INTERNAL_SERVER_ERROR, detail=str(err))
     
 
-@router.get("/", summary="Api for getting review data")
-async def get_reviews(review_id:int = Query(..., description="specific review data then enter review_id"), db = Depends(get_db)):
+def _review_fields(review) -> dict:
+    return {
+        "id": review.id,
+        "reviewer_name": review.reviewer_name,
+        "ratings": review.ratings,
+        "reviews": review.review,
+        "created_at": review.created_at,
+        "updated_at": review.updated_at,
+        "version": review.version,
+    }
+
+
+async def _load_review_book_id(db, review_id: int):
+    query = await db.execute(select(Reviews.book_id).where(Reviews.id == review_id))
+    return query.scalar_one_or_none()
+
+
+async def _review_book_id(db, review_id: int):
+    """Id of the review's book, None when the review doesn't exist. A review never
+    moves to another book, so the mapping only goes stale when it is deleted."""
+    cache_key = await versioned_key(f"review:{review_id}:book", f"review:{review_id}")
+    payload, _ = await get_or_load(cache_key, partial(_load_review_book_id, db, review_id))
+    return orjson.loads(payload) if payload is not None else None
+
+
+async def _load_review(db, review_id: int):
+    query = await db.execute(select(Reviews).options(joinedload(Reviews.book)).where(Reviews.id == review_id))
+    review = query.scalars().first()
+    if not review:
+        return None
+
+    book = review.book
+    return {
+        **_review_fields(review),
+        "book": {
+            "id": book.id,
+            "book_name": book.book_name,
+            "author": book.author,
+            "language": book.language,
+            "description": book.description,
+            "created_at": book.created_at,
+            "updated_at": book.updated_at
+        } if book else None
+    }
+
+
+@router.get("/", summary="Api for getting review data", response_model=ApiResponse[ReviewResult])
+async def get_reviews(request: Request, review_id:int = Query(..., description="specific review data then enter review_id"), db = Depends(get_db)):
     try:
-        query = await db.execute(select(Reviews).options(joinedload(Reviews.book)).where(Reviews.id == review_id))
-        review = query.scalars().first()
-        if not review:
+        book_id = await _review_book_id(db, review_id)
+        if book_id is None:
             return create_response(status.HTTP_404_NOT_FOUND, "Review is not found given review id")
-        
-        book = review.book
-
-        review_data = {
-            "id": review.id,
-            "reviewer_name": review.reviewer_name,
-            "ratings": review.ratings,
-            "reviews": review.review,
-            "created_at": review.created_at.isoformat() if isinstance(review.updated_at, datetime) else None,
-            "updated_at": review.updated_at.isoformat() if isinstance(review.updated_at, datetime) else None,
-    
-            "book": {
-                "id": book.id,
-                "book_name": book.book_name,
-                "author": book.author,
-                "language": book.language,
-                "description": book.description,
-                "created_at": book.created_at.isoformat() if isinstance(book.created_at, datetime) else None,
-                "updated_at": book.updated_at.isoformat() if isinstance(book.updated_at, datetime) else None
-            } if book else None
-        }
-
-        return create_response(status.HTTP_200_OK, "Book data is fetched succesfully", data={"result": review_data})
+
+        # The payload embeds the book, so it is also tagged with the book's own tag
+        cache_key = await versioned_key(f"review:{review_id}", f"review:{review_id}", f"book:{book_id}")
+        review_data, from_cache = await get_or_load(cache_key, partial(_load_review, db, review_id))
+        if review_data is None:
+            return create_response(status.HTTP_404_NOT_FOUND, "Review is not found given review id")
+
+        message = "Review data is fetched from cache" if from_cache else "Review data is fetched from database"
+        return cacheable_response(request, message, {"result": orjson.Fragment(review_data)}, etag_for(review_data))
 
     except Exception as err:
         logger.error("Error in getting review data api %s", err)
@@ -95,12 +236,18 @@ async def get_reviews(review_id:int = Query(..., description="specific review da
 @router.delete("/", summary="Api for deleting reviews data")
 async def books(review_id:int = Query(..., description="review_id to delete a particular review"), db = Depends(get_db)):
     try:
-        query = await db.execute(select(Reviews).where(Reviews.id == review_id))
-        review = query.scalars().first()  
+        query = await db.execute(
+            delete(Reviews).where(Reviews.id == review_id).returning(Reviews.book_id, Reviews.ratings, Reviews.created_at),
+            execution_options={"synchronize_session": False},
+        )
+        review = query.first()
         if not review:
             return create_response(status.HTTP_404_NOT_FOUND, "Review is not given review id")
-        
-        await db.delete(review)
+
+        await apply_rating_change(db, review.book_id, removed=[review.ratings])
+        record_reviews(db, review.book_id, review.created_at, count=-1)
+        add_cache_tags(db, *review_tags(review.book_id, review_id))
+        await record_deletions(db, "review", [review_id])
 
         await db.commit()
 
@@ -0,0 +1,50 @@
+"""Recompute the rating aggregates of every book from the reviews table.
+
+Usage: python -m app.commands.backfill_ratings [--batch-size 1000]
+"""
+import argparse
+import asyncio
+import logging
+from sqlalchemy import select
+from app.db.models.books import Books
+from app.db.session import SessionLocal, engine
+from app.utils.invalidation import add_cache_tags
+from app.utils.ratings import recompute_ratings
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill(batch_size: int):
+    after_id = 0
+    updated = 0
+    async with SessionLocal() as db:
+        while True:
+            query = await db.execute(
+                select(Books.id).where(Books.id > after_id).order_by(Books.id).limit(batch_size)
+            )
+            book_ids = query.scalars().all()
+            if not book_ids:
+                break
+
+            await db.execute(recompute_ratings(book_ids), execution_options={"synchronize_session": False})
+            add_cache_tags(db, "ratings", *(f"book:{book_id}" for book_id in book_ids))
+            await db.commit()
+
+            updated += len(book_ids)
+            after_id = book_ids[-1]
+            logger.info("Backfilled rating aggregates of %s books", updated)
+    await engine.dispose()
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute per-book rating aggregates")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(backfill(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
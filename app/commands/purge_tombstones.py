@@ -0,0 +1,39 @@
+"""Delete the change feed tombstones older than the retention.
+
+Usage: python -m app.commands.purge_tombstones [--days 30]
+
+Meant to run periodically (e.g. daily from cron). Change feed cursors last
+synced before the retention are refused afterwards, their consumers sync again
+from the beginning.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import timedelta
+from app.core.config import settings
+from app.db.session import SessionLocal, engine
+from app.utils.change_feed import purge_tombstones
+
+logger = logging.getLogger(__name__)
+
+
+async def purge(days: int):
+    async with SessionLocal() as db:
+        count = await purge_tombstones(db, timedelta(days=days))
+        await db.commit()
+    logger.info("Purged %s tombstones", count)
+    await engine.dispose()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete the change feed tombstones older than the retention")
+    parser.add_argument("--days", type=int, default=settings.CHANGES_TOMBSTONE_RETENTION_DAYS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(purge(args.days))
+
+
+if __name__ == "__main__":
+    main()
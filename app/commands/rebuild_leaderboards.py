@@ -0,0 +1,35 @@
+"""Rebuild the leaderboard sorted sets in Redis from the database.
+
+Usage: python -m app.commands.rebuild_leaderboards [--batch-size 1000]
+
+Meant to run periodically (e.g. from cron) to fix any drift of the incremental
+updates, or in-process with LEADERBOARD_REBUILD_INTERVAL_SECONDS.
+"""
+import argparse
+import asyncio
+import logging
+from app.db.session import SessionLocal, engine
+from app.utils.leaderboards import rebuild_leaderboards
+
+logger = logging.getLogger(__name__)
+
+
+async def rebuild(batch_size: int):
+    async with SessionLocal() as db:
+        counts = await rebuild_leaderboards(db, batch_size)
+    logger.info("Rebuilt leaderboards: %s", counts)
+    await engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the top rated and trending leaderboards")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(rebuild(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Build the cached payloads of the most read books.
+
+Usage: python -m app.commands.warm_cache [--top-k 1000] [--batch-size 100] [--pause 0.2] [--decay]
+
+Run it after a Redis flush or before sending traffic to a new deployment. Books
+are ranked by the access counts sampled by the API.
+"""
+import argparse
+import asyncio
+import logging
+from app.api.books import load_cached_books
+from app.core.config import settings
+from app.db.session import SessionLocal, engine
+from app.utils.cache_warming import decay_access_counts, warm_hot_books
+
+logger = logging.getLogger(__name__)
+
+
+async def warm(top_k: int, batch_size: int, pause: float, decay: bool):
+    built = await warm_hot_books(SessionLocal, load_cached_books, top_k, batch_size, pause)
+    if decay:
+        await decay_access_counts()
+    await engine.dispose()
+    return built
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the cache of the most read books")
+    parser.add_argument("--top-k", type=int, default=settings.CACHE_WARM_TOP_K)
+    parser.add_argument("--batch-size", type=int, default=settings.CACHE_WARM_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=settings.CACHE_WARM_BATCH_PAUSE_SECONDS, help="Seconds between batches")
+    parser.add_argument("--decay", action="store_true", help="Decay the access counts afterwards")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(warm(args.top_k, args.batch_size, args.pause, args.decay))
+
+
+if __name__ == "__main__":
+    main()
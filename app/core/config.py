@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from typing import List, ClassVar
+from urllib.parse import quote_plus
 
 
 class Settings(BaseSettings):
@@ -13,7 +14,149 @@ class Settings(BaseSettings):
     DB_HOST: str = ""
     DB_PORT: str = ""
     DB_NAME: str = ""
+
+    # Connections opened per engine at startup, before the app reports ready
+    DB_WARMUP_CONNECTIONS: int = 5
+
+    # Optional read replica, used by the export, whose results are not cached
+    DATABASE_READ_URL: str = ""
+
+    # Connection pool
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
+    # Query diagnostics (see app/db/metrics.py). Statements slower than
+    # DB_SLOW_QUERY_SECONDS are logged with their request, a sample of them with
+    # their plan; requests repeating one statement DB_REPEATED_STATEMENT_THRESHOLD
+    # times are flagged as N+1. 0 disables each of them.
+    DB_SLOW_QUERY_SECONDS: float = 0.2
+    DB_SLOW_QUERY_LOG_PARAMETERS: bool = True
+    # EXPLAIN ANALYZE runs the statement again, only SELECTs are explained
+    DB_EXPLAIN_SAMPLE_RATE: float = 0.0
+    DB_REPEATED_STATEMENT_THRESHOLD: int = 5
+    # Server-Timing response header with the query count and time of the request
+    DB_DEBUG_HEADERS: bool = False
     
+    # Pagination
+    BOOKS_PAGE_SIZE: int = 50
+    BOOKS_MAX_PAGE_SIZE: int = 500
+    REVIEWS_PAGE_SIZE: int = 20
+    REVIEWS_MAX_PAGE_SIZE: int = 100
+    REVIEW_PREVIEW_SIZE: int = 5
+    SEARCH_PAGE_SIZE: int = 20
+    SEARCH_MAX_PAGE_SIZE: int = 100
+    BOOKS_BATCH_MAX_IDS: int = 200
+
+    # Change feed (GET /api/books/changes). Changes younger than
+    # CHANGES_SETTLE_SECONDS are held back, so transactions that were still running
+    # can commit before the cursor moves past their timestamps. Cursors older than
+    # the tombstone retention are refused: the deletions they'd need are purged.
+    CHANGES_PAGE_SIZE: int = 500
+    CHANGES_MAX_PAGE_SIZE: int = 5000
+    CHANGES_SETTLE_SECONDS: float = 5.0
+    CHANGES_TOMBSTONE_RETENTION_DAYS: int = 30
+
+    # HTTP caching of GET responses: browsers revalidate with If-None-Match, shared
+    # caches (CDN) may serve a response for HTTP_CACHE_SHARED_MAX_AGE seconds
+    HTTP_CACHE_MAX_AGE: int = 0
+    HTTP_CACHE_SHARED_MAX_AGE: int = 5
+
+    # Response compression (see app/utils/compression.py). Encodings in order of
+    # preference; br and zstd need the brotli and zstandard packages
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_ENCODINGS: str = "zstd,br,gzip"
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_CACHE_MAX_ENTRIES: int = 1000
+
+    # Leaderboards (Redis sorted sets, see app/utils/leaderboards.py)
+    LEADERBOARD_PAGE_SIZE: int = 10
+    LEADERBOARD_MAX_SIZE: int = 100
+    LEADERBOARD_PRIOR_RATING: float = 3.0
+    LEADERBOARD_PRIOR_WEIGHT: int = 10
+    LEADERBOARD_TRENDING_WINDOW_DAYS: int = 7
+    LEADERBOARD_TRENDING_HALF_LIFE_DAYS: float = 2.0
+    LEADERBOARD_TRENDING_REFRESH_SECONDS: int = 60
+    # 0 disables the in-process rebuild, e.g. when it runs from cron instead
+    LEADERBOARD_REBUILD_INTERVAL_SECONDS: int = 0
+
+    # Rate limiting: token bucket per API key (or IP), refilled at
+    # RATE_LIMIT_PER_SECOND up to RATE_LIMIT_BURST tokens, see app/utils/rate_limit.py.
+    # Off by default: behind a proxy, enable it together with
+    # RATE_LIMIT_TRUST_FORWARDED_FOR or every client shares the proxy's bucket
+    RATE_LIMIT_ENABLED: bool = False
+    RATE_LIMIT_PER_SECOND: float = 20.0
+    RATE_LIMIT_BURST: int = 100
+    RATE_LIMIT_LEASE_SIZE: int = 10
+    RATE_LIMIT_LEASE_TTL_SECONDS: float = 1.0
+    RATE_LIMIT_API_KEY_HEADER: str = "X-API-Key"
+    # Comma separated API keys that get a bucket of their own; requests with any
+    # other key are limited by IP, and their failed key attempts separately
+    RATE_LIMIT_API_KEYS: str = ""
+    RATE_LIMIT_INVALID_KEY_PER_SECOND: float = 1.0
+    RATE_LIMIT_INVALID_KEY_BURST: int = 10
+    # Take the client IP from the first X-Forwarded-For entry; only set it when a
+    # trusted proxy overwrites that header, as clients could pick their bucket otherwise
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False
+
+    # Write-behind review queue: POST /api/reviews/ answers 202 and reviews are
+    # written in batches by a background task
+    REVIEW_QUEUE_ENABLED: bool = False
+    REVIEW_QUEUE_MAX_SIZE: int = 10000
+    REVIEW_QUEUE_BATCH_SIZE: int = 500
+    REVIEW_QUEUE_FLUSH_INTERVAL: float = 0.05
+    REVIEW_QUEUE_RETRY_AFTER: int = 1
+
+    # Bulk ingest
+    BULK_MAX_ROWS: int = 50000
+    BULK_CHUNK_SIZE: int = 1000
+    BULK_DELETE_MAX_IDS: int = 10000
+
+    # Export
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # Redis
+    REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 100
+    REDIS_SOCKET_TIMEOUT: float = 1.0
+    REDIS_CONNECT_TIMEOUT: float = 1.0
+    REDIS_WARMUP_CONNECTIONS: int = 5
+    # Circuit breaker around Redis calls: every call is bounded by
+    # REDIS_CALL_TIMEOUT_SECONDS, REDIS_BREAKER_FAILURE_THRESHOLD consecutive
+    # failures skip Redis for REDIS_BREAKER_RESET_SECONDS before probing it again
+    REDIS_CALL_TIMEOUT_SECONDS: float = 0.1
+    REDIS_BREAKER_FAILURE_THRESHOLD: int = 5
+    REDIS_BREAKER_RESET_SECONDS: float = 5.0
+
+    # Timeout of each dependency check of /readyz
+    READINESS_TIMEOUT_SECONDS: float = 0.5
+
+    # Cache
+    CACHE_TTL_SECONDS: int = 86400
+    CACHE_L1_MAX_ENTRIES: int = 10000
+    CACHE_L1_TTL_SECONDS: int = 60
+    CACHE_VERSION_TTL_SECONDS: float = 1.0
+    CACHE_EARLY_EXPIRY_BETA: float = 1.0
+    # How long expired in-process entries may still be served while Redis is unavailable
+    CACHE_STALE_TTL_SECONDS: float = 300.0
+
+    # Cache warming: a sample of book reads is counted in Redis, and the payloads
+    # of the CACHE_WARM_TOP_K most read books are built ahead of traffic
+    CACHE_WARM_SAMPLE_RATE: float = 0.05
+    CACHE_WARM_FLUSH_SAMPLES: int = 50
+    CACHE_WARM_TOP_K: int = 1000
+    CACHE_WARM_BATCH_SIZE: int = 100
+    CACHE_WARM_BATCH_PAUSE_SECONDS: float = 0.2
+    CACHE_WARM_DECAY: float = 0.5
+    CACHE_WARM_MAX_TRACKED: int = 10000
+    CACHE_WARM_ON_STARTUP: bool = False
+    CACHE_WARM_STARTUP_TIMEOUT_SECONDS: float = 30.0
+    # 0 disables periodic warming
+    CACHE_WARM_INTERVAL_SECONDS: int = 0
+
     # CORS
     ALLOWED_ORIGINS: List[str] = ["*"]
 
@@ -25,6 +168,16 @@ class Settings(BaseSettings):
     # Cascading value
     CASCADE: ClassVar[str] = "all, delete-orphan"
 
+    @property
+    def database_url(self) -> str:
+        """DATABASE_URL, or an asyncpg URL built from the DB_* settings."""
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
+        return (
+            f"postgresql+asyncpg://{quote_plus(self.DB_USER)}:{quote_plus(self.DB_PASSWORD)}"
+            f"@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+        )
+
     class Config:
         env_file = ".env"
 
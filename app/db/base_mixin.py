@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime
+from sqlalchemy import Column, DateTime, Integer
 from datetime import datetime, timezone
 
 class TimestampMixin:
@@ -13,3 +13,5 @@ class TimestampMixin:
         onupdate=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
         nullable=False
     )
+    # Incremented by every PATCH, which can require the version the client last read
+    version = Column(Integer, nullable=False, default=1, server_default="1")
@@ -0,0 +1,180 @@
+import logging
+import random
+import time
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_checkout_stats = {"checkouts": 0, "checkout_timeouts": 0, "checkout_wait_seconds": 0.0, "checkout_wait_max_seconds": 0.0}
+_request_totals = {"requests": 0, "queries": 0, "query_seconds": 0.0, "slow_queries": 0, "repeated_statement_requests": 0}
+
+# Plan of a statement, by dialect. PostgreSQL runs the statement again, so it is
+# wrapped in a savepoint lest a failing EXPLAIN abort the request's transaction.
+EXPLAIN_PREFIXES = {
+    "postgresql": "EXPLAIN (ANALYZE, BUFFERS) ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+}
+_MAX_LOGGED_PARAMETERS = 500
+
+
+class QueryStats:
+    """Queries issued while serving one request."""
+
+    __slots__ = ("label", "queries", "duration", "slow_queries", "statements")
+
+    def __init__(self, label: str = None):
+        self.label = label
+        self.queries = 0
+        self.duration = 0.0
+        self.slow_queries = 0
+        # Executions of each statement, to spot N+1 patterns
+        self.statements = Counter()
+
+    def repeated_statements(self) -> dict:
+        threshold = settings.DB_REPEATED_STATEMENT_THRESHOLD
+        if threshold <= 0:
+            return {}
+        return {statement: count for statement, count in self.statements.items() if count >= threshold}
+
+    def server_timing(self) -> str:
+        return f'db;desc="{self.queries} queries";dur={self.duration * 1000:.2f}'
+
+
+request_query_stats: ContextVar = ContextVar("request_query_stats", default=None)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long callers wait for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            _checkout_stats["checkout_timeouts"] += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            _checkout_stats["checkouts"] += 1
+            _checkout_stats["checkout_wait_seconds"] += waited
+            _checkout_stats["checkout_wait_max_seconds"] = max(_checkout_stats["checkout_wait_max_seconds"], waited)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # On the execution context, which is dropped with the statement even when it raises
+    context._query_started = time.perf_counter()
+
+
+def _explain(conn, statement, parameters):
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    # Straight on the DBAPI connection, so the EXPLAIN isn't itself timed and logged
+    cursor = conn.connection.cursor()
+    savepoint = conn.dialect.name == "postgresql"
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT explain_slow_query")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            plan = "\n".join(str(row[-1]) for row in cursor.fetchall())
+        except Exception:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT explain_slow_query")
+            raise
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT explain_slow_query")
+        return plan
+    finally:
+        cursor.close()
+
+
+def _log_slow_query(conn, statement, parameters, executemany, duration, stats):
+    logged_parameters = "(not logged)"
+    if settings.DB_SLOW_QUERY_LOG_PARAMETERS:
+        logged_parameters = repr(parameters)[:_MAX_LOGGED_PARAMETERS]
+    logger.warning(
+        "Slow query (%.1f ms) during %s: %s parameters=%s",
+        duration * 1000, stats.label if stats else "background task", statement, logged_parameters
+    )
+
+    if executemany or random.random() >= settings.DB_EXPLAIN_SAMPLE_RATE:
+        return
+    try:
+        plan = _explain(conn, statement, parameters)
+    except Exception as e:
+        logger.warning("Could not explain slow query: %s", e)
+        return
+    if plan:
+        logger.warning("Plan of slow query (%.1f ms):\n%s", duration * 1000, plan)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - context._query_started
+    stats = request_query_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.duration += duration
+        if settings.DB_REPEATED_STATEMENT_THRESHOLD > 0:
+            stats.statements[statement] += 1
+    if 0 < settings.DB_SLOW_QUERY_SECONDS <= duration:
+        _request_totals["slow_queries"] += 1
+        if stats is not None:
+            stats.slow_queries += 1
+        _log_slow_query(conn, statement, parameters, executemany, duration, stats)
+
+
+def instrument_engine(engine):
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def start_request_stats(label: str = None) -> QueryStats:
+    """Start counting the queries of the current request; `label` names it in logs."""
+    stats = QueryStats(label)
+    request_query_stats.set(stats)
+    return stats
+
+
+def finish_request_stats(stats: QueryStats):
+    """Add the request to the totals and log its summary, with a warning for
+    statements it repeated (likely N+1: one query per row of a previous one)."""
+    _request_totals["requests"] += 1
+    _request_totals["queries"] += stats.queries
+    _request_totals["query_seconds"] += stats.duration
+    logger.debug("%s issued %s queries in %.2f ms", stats.label or "Request", stats.queries, stats.duration * 1000)
+
+    repeated = stats.repeated_statements()
+    if repeated:
+        _request_totals["repeated_statement_requests"] += 1
+        logger.warning(
+            "Possible N+1 during %s (%s queries in %.2f ms): %s",
+            stats.label or "request", stats.queries, stats.duration * 1000,
+            "; ".join(f"{count}x {statement}" for statement, count in repeated.items())
+        )
+
+
+def get_db_stats(*engines) -> dict:
+    pools = {}
+    for engine in engines:
+        pool = engine.pool
+        status = {"checked_out": pool.checkedout()} if hasattr(pool, "checkedout") else {}
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            status.update(size=pool.size(), checked_in=pool.checkedin(), overflow=pool.overflow())
+        pools[engine.url.render_as_string(hide_password=True)] = status
+
+    checkouts = _checkout_stats["checkouts"]
+    requests = _request_totals["requests"]
+    return {
+        "pools": pools,
+        **_checkout_stats,
+        "checkout_wait_avg_seconds": _checkout_stats["checkout_wait_seconds"] / checkouts if checkouts else 0.0,
+        **_request_totals,
+        "queries_per_request": _request_totals["queries"] / requests if requests else 0.0,
+        "query_seconds_per_request": _request_totals["query_seconds"] / requests if requests else 0.0,
+    }
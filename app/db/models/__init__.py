@@ -1,2 +1,3 @@
 from app.db.models.books import Books
-from app.db.models.reviews import Reviews
\ No newline at end of file
+from app.db.models.reviews import Reviews
+from app.db.models.tombstones import Tombstones
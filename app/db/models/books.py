@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, Column, String, Text
+from sqlalchemy import Integer, Column, String, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from app.core.config import settings
 from app.db.base import Base
@@ -6,7 +6,12 @@ from app.db.base_mixin import TimestampMixin
 
 class Books(Base, TimestampMixin):
     __tablename__ = "books"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        UniqueConstraint("book_name", "author", name="uq_books_book_name_author"),
+        # Change feed order
+        Index("ix_books_updated_at_id", "updated_at", "id"),
+        {'extend_existing': True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     book_name = Column(String, nullable=False, index=True)
@@ -14,4 +19,15 @@ class Books(Base, TimestampMixin):
     description = Column(Text, nullable=True)
     language = Column(String, nullable=False)
 
-    reviews = relationship("Reviews", back_populates="book", cascade=settings.CASCADE)
\ No newline at end of file
+    # Rating aggregates, maintained incrementally by the reviews api
+    review_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_1_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_2_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_3_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_4_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_5_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Reviews are deleted by the reviews.book_id ON DELETE CASCADE foreign key,
+    # without loading them
+    reviews = relationship("Reviews", back_populates="book", cascade=settings.CASCADE, passive_deletes=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Text, String, Integer, ForeignKey, Column
+from sqlalchemy import Text, String, Integer, ForeignKey, Column, Index
 from sqlalchemy.orm import relationship
 from app.core.config import settings
 from app.db.base_mixin import TimestampMixin
@@ -6,7 +6,14 @@ from app.db.base import Base
 
 class Reviews(Base, TimestampMixin):
     __tablename__ = "reviews"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Keyset pagination of a book's reviews, newest first or by rating
+        Index("ix_reviews_book_id_created_at_id", "book_id", "created_at", "id"),
+        Index("ix_reviews_book_id_ratings_id", "book_id", "ratings", "id"),
+        # Change feed order
+        Index("ix_reviews_updated_at_id", "updated_at", "id"),
+        {'extend_existing': True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
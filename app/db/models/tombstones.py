@@ -0,0 +1,21 @@
+from sqlalchemy import Integer, Column, String, DateTime, Index
+from datetime import datetime, timezone
+from app.db.base import Base
+
+class Tombstones(Base):
+    """Deleted books and reviews, so the change feed can report deletions."""
+    __tablename__ = "tombstones"
+    __table_args__ = (
+        # Change feed order
+        Index("ix_tombstones_deleted_at_id", "deleted_at", "id"),
+        {'extend_existing': True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    record_type = Column(String, nullable=False)
+    record_id = Column(Integer, nullable=False)
+    deleted_at = Column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
+        nullable=False
+    )
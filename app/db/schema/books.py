@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional
+from datetime import datetime
 
 class CreateBooks(BaseModel):
     book_name: str
@@ -12,4 +13,108 @@ class UpdateBooks(BaseModel):
     book_name: Optional[str] = None 
     author: Optional[str] = None
     description: Optional[str] = None
-    language: Optional[str] = None
\ No newline at end of file
+    language: Optional[str] = None
+    # When given, the update only applies if the book is still at this version
+    version: Optional[int] = None
+
+class BookBatchRequest(BaseModel):
+    ids: List[int]
+
+class BookBulkDeleteRequest(BaseModel):
+    ids: List[int]
+
+# Response models, used to document the payloads built in app/api/books.py
+
+class BookReview(BaseModel):
+    id: int
+    reviewer_name: str
+    ratings: int
+    review: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class BookDetail(BaseModel):
+    id: int
+    name: str
+    author: str
+    language: str
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
+    review_count: int
+    avg_rating: Optional[float] = None
+    rating_histogram: Dict[str, int]
+    reviews: List[BookReview]
+    reviews_next_cursor: Optional[str] = None
+
+class BookListItem(BaseModel):
+    """Only the fields requested with `fields=` are present."""
+    id: int
+    name: Optional[str] = None
+    author: Optional[str] = None
+    description: Optional[str] = None
+    language: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    review_count: Optional[int] = None
+    avg_rating: Optional[float] = None
+
+class BookSearchItem(BaseModel):
+    id: int
+    name: str
+    author: str
+    description: Optional[str] = None
+    language: str
+    score: Optional[float] = None
+
+class BookResult(BaseModel):
+    result: BookDetail
+
+class BookPage(BaseModel):
+    result: List[BookListItem]
+    next_cursor: Optional[str] = None
+
+class BookReviewPage(BaseModel):
+    result: List[BookReview]
+    next_cursor: Optional[str] = None
+
+class BookSearchResults(BaseModel):
+    result: List[BookSearchItem]
+
+class BookBatchItem(BaseModel):
+    id: int
+    found: bool
+    book: Optional[BookDetail] = None
+
+class BookBatchResults(BaseModel):
+    """Results are in request order, with duplicate ids removed."""
+    result: List[BookBatchItem]
+    missing: List[int]
+
+class BookBulkDeleteResults(BaseModel):
+    deleted: List[int]
+    missing: List[int]
+
+
+class BookChange(BaseModel):
+    type: str
+    op: str
+    id: int
+    changed_at: datetime
+    data: Optional[Dict[str, Any]] = None
+
+class BookChanges(BaseModel):
+    """Changes in (changed_at, type, id) order; deleting a book also deletes its reviews."""
+    result: List[BookChange]
+    next_cursor: str
+    has_more: bool
+
+
+class BookLeaderboardItem(BaseModel):
+    rank: int
+    score: float
+    book: BookDetail
+
+class BookLeaderboard(BaseModel):
+    result: List[BookLeaderboardItem]
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import Any, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+class ApiResponse(BaseModel, Generic[T]):
+    status_code: int
+    message: Optional[str] = None
+    data: Optional[T] = None
+    detail: Optional[Any] = None
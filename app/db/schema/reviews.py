@@ -1,13 +1,41 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
+from datetime import datetime
 
 class PostReviews(BaseModel):
     book_id: int
-    ratings: float
+    ratings: int = Field(..., ge=1, le=5)
     review: str
     reviewer_name: str
 
 class UpdateReviews(BaseModel):
     review_id: int
-    ratings: Optional[float] = None
-    review: Optional[str] = None
\ No newline at end of file
+    ratings: Optional[int] = Field(None, ge=1, le=5)
+    review: Optional[str] = None
+    # When given, the update only applies if the review is still at this version
+    version: Optional[int] = None
+
+
+# Response models, used to document the payloads built in app/api/reviews.py
+
+class ReviewBook(BaseModel):
+    id: int
+    book_name: str
+    author: str
+    language: str
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class ReviewDetail(BaseModel):
+    id: int
+    reviewer_name: str
+    ratings: int
+    reviews: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
+    book: Optional[ReviewBook] = None
+
+class ReviewResult(BaseModel):
+    result: ReviewDetail
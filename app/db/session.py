@@ -1,14 +1,83 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
 from app.core.config import settings
+from app.db.metrics import TimedQueuePool, instrument_engine
+from app.utils.invalidation import track_cache_tags, invalidate_committed
+from app.utils.leaderboards import track_leaderboard_changes, apply_committed
+
+
+def _engine_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {}
+
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    return options
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite only enforces foreign keys, and their ON DELETE CASCADE, when asked to
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _create_engine(url: str):
+    db_engine = create_async_engine(url, echo=False, **_engine_options(url))
+    if url.startswith("sqlite"):
+        event.listen(db_engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+    instrument_engine(db_engine)
+    return db_engine
+
+
+# Engines connect lazily: the first connections are opened by the app lifespan
+engine = _create_engine(settings.database_url)
+
+if settings.DATABASE_READ_URL:
+    read_engine = _create_engine(settings.DATABASE_READ_URL)
+else:
+    read_engine = engine
+
+
+class CacheTrackingSession(Session):
+    pass
+
+
+track_cache_tags(CacheTrackingSession)
+track_leaderboard_changes(CacheTrackingSession)
+
+
+class InvalidatingSession(AsyncSession):
+    """AsyncSession that bumps the cache versions of everything it committed and
+    applies its leaderboard changes."""
+
+    async def commit(self):
+        await super().commit()
+        await invalidate_committed(self)
+        await apply_committed(self)
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False
-)
 
 SessionLocal = async_sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine,
+    class_=InvalidatingSession,
+    sync_session_class=CacheTrackingSession
+)
+
+# Sessions on the read replica, for reads whose results are never cached
+ReadSessionLocal = async_sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=read_engine,
     class_=AsyncSession
-)
\ No newline at end of file
+)
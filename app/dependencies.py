@@ -5,4 +5,4 @@ from sqlalchemy.ext.asyncio import AsyncSession
 # DB SESSION DEPENDENCY
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with SessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
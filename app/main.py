@@ -1,10 +1,70 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api import books, reviews
+from app.api.books import load_cached_books
+from app.utils import cache
+from app.utils.cache import get_cache_stats
+from app.db.metrics import get_db_stats
+from app.db.session import SessionLocal, engine, read_engine
+from app.utils.metrics import MetricsMiddleware, METRICS_CONTENT_TYPE, render_metrics
+from app.utils.rate_limit import RateLimitMiddleware
+from app.utils.compression import CompressionMiddleware
+from app.utils.response import create_response
+from app.utils.review_ingest import review_queue
+from app.utils.leaderboards import run_periodic_rebuild
+from app.utils.health import readiness, state, warm_up_database, warm_up_redis
+from app.utils.cache_warming import flush_access_counts, run_periodic_warming, warm_from_settings
 
-app = FastAPI(title="Books review api")
+logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.gather(
+        *(warm_up_database(db_engine, settings.DB_WARMUP_CONNECTIONS) for db_engine in _engines()),
+        warm_up_redis(settings.REDIS_WARMUP_CONNECTIONS),
+    )
+    if settings.CACHE_WARM_ON_STARTUP:
+        try:
+            await asyncio.wait_for(
+                warm_from_settings(SessionLocal, load_cached_books), settings.CACHE_WARM_STARTUP_TIMEOUT_SECONDS
+            )
+        except Exception as e:
+            logger.warning("Cache warming on startup failed: %s", e or type(e).__name__)
+    state["warmed_up"] = True
+    if settings.REVIEW_QUEUE_ENABLED:
+        review_queue.start()
+    leaderboard_rebuild = None
+    if settings.LEADERBOARD_REBUILD_INTERVAL_SECONDS > 0:
+        leaderboard_rebuild = asyncio.create_task(
+            run_periodic_rebuild(SessionLocal, settings.LEADERBOARD_REBUILD_INTERVAL_SECONDS)
+        )
+    cache_warming = None
+    if settings.CACHE_WARM_INTERVAL_SECONDS > 0:
+        cache_warming = asyncio.create_task(
+            run_periodic_warming(SessionLocal, load_cached_books, settings.CACHE_WARM_INTERVAL_SECONDS)
+        )
+    yield
+    for task in (leaderboard_rebuild, cache_warming):
+        if task is not None:
+            task.cancel()
+    await flush_access_counts()
+    # Write every review accepted with a 202 before the process exits
+    await review_queue.stop()
+    state["warmed_up"] = False
+    for db_engine in _engines():
+        await db_engine.dispose()
+    await cache.redis_client.aclose()
+
+
+app = FastAPI(title="Books review api", lifespan=lifespan)
+
+# Inside CORS so that 429 responses carry the CORS headers too
+app.add_middleware(RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -12,6 +72,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(books, prefix=f"{settings.API_V1_STR}/books", tags=["Book"])
 app.include_router(reviews, prefix=f"{settings.API_V1_STR}/reviews", tags=["Reviews"])
@@ -19,4 +81,41 @@ app.include_router(reviews, prefix=f"{settings.API_V1_STR}/reviews", tags=["Revi
 
 @app.get("/", tags=["Root"])
 def root():
-    return {"message": "Welcome to book review api"}
\ No newline at end of file
+    return {"message": "Welcome to book review api"}
+
+
+@app.get("/healthz", tags=["Health"])
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return create_response(status.HTTP_200_OK, "OK")
+
+
+@app.get("/readyz", tags=["Health"])
+async def readyz():
+    """Readiness: warmed up, and the database and Redis answer within READINESS_TIMEOUT_SECONDS."""
+    if not state["warmed_up"]:
+        return create_response(status.HTTP_503_SERVICE_UNAVAILABLE, "Warming up")
+
+    checks = await readiness(_engines(), settings.READINESS_TIMEOUT_SECONDS)
+    if any(result != "ok" for result in checks.values()):
+        return create_response(status.HTTP_503_SERVICE_UNAVAILABLE, "Not ready", data={"result": checks})
+    return create_response(status.HTTP_200_OK, "Ready", data={"result": checks})
+
+
+@app.get("/cache/stats", tags=["Cache"])
+def cache_stats():
+    return create_response(status.HTTP_200_OK, "Cache statistics", data={"result": get_cache_stats()})
+
+
+def _engines():
+    return (engine,) if read_engine is engine else (engine, read_engine)
+
+
+@app.get("/db/stats", tags=["Database"])
+def db_stats():
+    return create_response(status.HTTP_200_OK, "Database statistics", data={"result": get_db_stats(*_engines())})
+
+
+@app.get("/metrics", tags=["Metrics"], include_in_schema=False)
+def metrics():
+    return Response(render_metrics(get_db_stats(*_engines())["pools"]), media_type=METRICS_CONTENT_TYPE)
@@ -0,0 +1,65 @@
+import json
+from fastapi import Request
+from sqlalchemy.dialects import postgresql, sqlite
+from pydantic import ValidationError
+
+
+class BulkPayloadError(ValueError):
+    pass
+
+
+async def read_bulk_rows(request: Request, max_rows: int) -> list:
+    """Parse a bulk request body sent as a JSON array or as NDJSON.
+
+    Returns one entry per row: the decoded object, or a `BulkPayloadError` for an
+    NDJSON line that isn't valid JSON.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        rows = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as err:
+                rows.append(BulkPayloadError(f"Invalid JSON: {err}"))
+    else:
+        try:
+            rows = json.loads(body)
+        except ValueError as err:
+            raise BulkPayloadError(f"Invalid JSON: {err}") from err
+        if not isinstance(rows, list):
+            raise BulkPayloadError("Expected a JSON array of rows")
+
+    if len(rows) > max_rows:
+        raise BulkPayloadError(f"At most {max_rows} rows are accepted per request")
+    return rows
+
+
+def validate_rows(rows: list, schema):
+    """Split parsed rows into `(index, model)` pairs and per-row error results."""
+    valid, errors = [], []
+    for index, row in enumerate(rows):
+        if isinstance(row, Exception):
+            errors.append({"index": index, "status": "invalid", "error": str(row)})
+            continue
+        try:
+            valid.append((index, schema.model_validate(row)))
+        except ValidationError as err:
+            errors.append({"index": index, "status": "invalid", "error": err.errors(include_url=False, include_context=False)})
+    return valid, errors
+
+
+def chunked(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def dialect_insert(db, model):
+    """`INSERT` construct supporting ON CONFLICT for the session's database."""
+    if db.bind.dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
@@ -1,23 +1,436 @@
 import redis.asyncio as redis
-import json
+import asyncio
+import orjson
 import logging
+import math
+import random
+import time
+from collections import OrderedDict
+from app.core.config import settings
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.utils.metrics import CACHE_LATENCY, CACHE_LOOKUPS
 
 logger = logging.getLogger(__name__)
 
-# Create a Redis client
-redis_client = redis.Redis(host="localhost", port=6379, decode_responses=True)
+# Connections are opened on first use, or warmed up by the app lifespan
+redis_client = redis.Redis.from_url(
+    settings.REDIS_URL,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+)
 
-async def get_cached_data(key: str):
+
+class LocalCache:
+    """Bounded in-process LRU cache with a per-entry expiry.
+
+    Expired entries are kept for another `stale_ttl` seconds, during which they are
+    only returned by `get(key, stale=True)`.
+    """
+
+    def __init__(self, max_entries: int, stale_ttl: float = 0.0):
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+
+    def get(self, key: str, stale: bool = False):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        now = time.time()
+        if expires_at <= now:
+            if expires_at + self.stale_ttl <= now:
+                del self._entries[key]
+                return None
+            if not stale:
+                return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value, ttl: float):
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.time() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def encode(value) -> bytes:
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+
+class CacheEntry:
+    """Serialized payload plus the metadata used for early expiration.
+
+    Stored in Redis as b"<delta> <expires_at>\\n" followed by the payload bytes, so a
+    hit can be returned to the client without decoding the payload.
+    """
+
+    __slots__ = ("value", "delta", "expires_at")
+
+    def __init__(self, value: bytes, delta: float, expires_at: float):
+        self.value = value
+        self.delta = delta
+        self.expires_at = expires_at
+
+    def should_refresh(self) -> bool:
+        """Probabilistic early expiration: the closer to expiry and the slower the
+        value is to rebuild, the more likely a reader volunteers to refresh it."""
+        if settings.CACHE_EARLY_EXPIRY_BETA <= 0:
+            return False
+        jitter = -self.delta * settings.CACHE_EARLY_EXPIRY_BETA * math.log(1.0 - random.random())
+        return time.time() + jitter >= self.expires_at
+
+
+local_cache = LocalCache(settings.CACHE_L1_MAX_ENTRIES, settings.CACHE_STALE_TTL_SECONDS)
+_inflight = {}
+_LOAD_FAILED = object()
+_stats = {"l1_hits": 0, "l2_hits": 0, "stale_hits": 0, "db_loads": 0, "coalesced": 0, "early_refreshes": 0}
+# Tags whose version bump failed, bumped again as soon as Redis is back
+_pending_bumps = set()
+
+
+def _bump_pending():
+    if _pending_bumps:
+        asyncio.get_running_loop().create_task(bump_versions(()))
+
+
+redis_breaker = CircuitBreaker(
+    "redis",
+    settings.REDIS_BREAKER_FAILURE_THRESHOLD,
+    settings.REDIS_BREAKER_RESET_SECONDS,
+    settings.REDIS_CALL_TIMEOUT_SECONDS,
+    on_close=_bump_pending,
+)
+
+
+def log_redis_error(operation: str, error: Exception):
+    # An open circuit was already logged when it opened
+    if not isinstance(error, CircuitOpenError):
+        logger.error("Redis %s error: %s", operation, error or type(error).__name__)
+
+
+def _count(outcome: str):
+    _stats[outcome] += 1
+    CACHE_LOOKUPS.labels(outcome).inc()
+
+
+def get_cache_stats():
+    outcomes = ("l1_hits", "l2_hits", "stale_hits", "db_loads", "coalesced")
+    lookups = sum(_stats[name] for name in outcomes)
+    ratios = {
+        f"{name}_ratio": round(_stats[name] / lookups, 4) if lookups else 0.0
+        for name in outcomes
+    }
+    return {**_stats, **ratios, "lookups": lookups, "l1_entries": len(local_cache), "redis_circuit": redis_breaker.state}
+
+
+def _version_key(tag: str) -> str:
+    return f"version:{tag}"
+
+
+async def versioned_key(key: str, *tags: str):
+    """Return `key` suffixed with the current version of every tag it depends on.
+
+    Bumping any of the tags moves readers to a new key, so stale entries are never
+    read again and simply expire. Versions are kept in the local cache for
+    CACHE_VERSION_TTL_SECONDS. Returns None when the versions can't be read.
+    """
+    return (await versioned_keys([(key, tags)]))[0]
+
+
+async def versioned_keys(keys_and_tags):
+    """`versioned_key` for many `(key, tags)` pairs, reading the versions with one MGET."""
+    versions = await tag_versions(tag for _, tags in keys_and_tags for tag in tags)
+    if versions is None:
+        return [None] * len(keys_and_tags)
+    return [_versioned(key, tags, versions) for key, tags in keys_and_tags]
+
+
+def _versioned(key: str, tags, versions: dict) -> str:
+    return f"{key}:v" + ".".join(versions[tag] for tag in tags) if tags else key
+
+
+async def tag_versions(tags):
+    """Current version of every tag, or None when the versions can't be read."""
+    tags = list(dict.fromkeys(tags))
+    versions = {tag: local_cache.get(_version_key(tag)) for tag in tags}
+    missing = [tag for tag, version in versions.items() if version is None]
+    if missing:
+        try:
+            with CACHE_LATENCY.labels("mget").time():
+                fetched = await redis_breaker.call(redis_client.mget, [_version_key(tag) for tag in missing])
+        except Exception as e:
+            log_redis_error("version get", e)
+            # Redis is unavailable: fall back to recently expired versions
+            stale = [local_cache.get(_version_key(tag), stale=True) for tag in missing]
+            if None in stale:
+                return None
+            fetched = [version.encode() for version in stale]
+        for tag, version in zip(missing, fetched):
+            versions[tag] = (version or b"0").decode()
+            local_cache.set(_version_key(tag), versions[tag], settings.CACHE_VERSION_TTL_SECONDS)
+    return versions
+
+
+async def bump_versions(tags):
+    for tag in tags:
+        local_cache.delete(_version_key(tag))
+    tags = sorted(_pending_bumps.union(tags))
+    if not tags:
+        return
+    _pending_bumps.clear()
     try:
-        cached = await redis_client.get(key)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(_version_key(tag))
+                # Outlive every entry written under the previous version
+                pipe.expire(_version_key(tag), settings.CACHE_TTL_SECONDS * 2)
+            with CACHE_LATENCY.labels("pipeline").time():
+                results = await redis_breaker.call(pipe.execute)
+    except Exception as e:
+        log_redis_error("version bump", e)
+        _pending_bumps.update(tags)
+        return
+    # INCR returned the new versions, no need to read them back
+    for tag, version in zip(tags, results[::2]):
+        local_cache.set(_version_key(tag), str(version), settings.CACHE_VERSION_TTL_SECONDS)
+
+
+def _decode_entry(cached: bytes) -> CacheEntry:
+    header, _, payload = cached.partition(b"\n")
+    delta, expires_at = header.split()
+    return CacheEntry(payload, float(delta), float(expires_at))
+
+
+def _encode_entry(entry: CacheEntry) -> bytes:
+    return f"{entry.delta:.6f} {entry.expires_at:.6f}\n".encode() + entry.value
+
+
+def _entry_ttl(entry: CacheEntry) -> int:
+    return max(1, math.ceil(entry.expires_at - time.time()))
+
+
+async def _get_entry(key: str):
+    try:
+        with CACHE_LATENCY.labels("get").time():
+            cached = await redis_breaker.call(redis_client.get, key)
         if cached:
-            return json.loads(cached)
+            return _decode_entry(cached)
     except Exception as e:
-        logger.error("Redis get error: %s", e)
+        log_redis_error("get", e)
     return None
 
-async def set_cached_data(key: str, value, expire_seconds: int = 6400):
+
+async def _set_entry(key: str, entry: CacheEntry):
+    try:
+        with CACHE_LATENCY.labels("set").time():
+            await redis_breaker.call(redis_client.set, key, _encode_entry(entry), ex=_entry_ttl(entry))
+    except Exception as e:
+        log_redis_error("set", e)
+
+
+def _remember(key: str, entry: CacheEntry):
+    local_cache.set(key, entry, min(settings.CACHE_L1_TTL_SECONDS, entry.expires_at - time.time()))
+
+
+async def get_cached_data(key: str):
+    """Serialized payload stored under `key`, or None."""
+    if key is None:
+        return None
+    entry = local_cache.get(key) or await _get_entry(key)
+    if entry is None and not redis_breaker.available:
+        entry = local_cache.get(key, stale=True)
+    return entry.value if entry else None
+
+
+async def set_cached_data(key: str, value, expire_seconds: int = None, delta: float = 0.0):
+    if key is None:
+        return
+    payload = value if isinstance(value, bytes) else encode(value)
+    entry = CacheEntry(payload, delta, time.time() + (expire_seconds or settings.CACHE_TTL_SECONDS))
+    _remember(key, entry)
+    await _set_entry(key, entry)
+    return payload
+
+
+async def write_through(key: str, previous_versions: dict, bumped, changes: dict, expire_seconds: int = None):
+    """Keep the entry of `key` cached across a committed write.
+
+    `previous_versions` are the `tag_versions` of the key's tags read before the
+    write and `bumped` the tags the write invalidated. If no other write bumped any
+    of them in between, the entry cached under the previous versions, updated with
+    `changes`, is stored under the new ones so the next read is a hit. Otherwise,
+    or when nothing was cached, the next read loads the value.
+    """
+    if previous_versions is None:
+        return
+    versions = await tag_versions(previous_versions)
+    expected = {
+        tag: str(int(version) + 1) if tag in bumped else version
+        for tag, version in previous_versions.items()
+    }
+    if versions != expected:
+        return
+    payload = await get_cached_data(_versioned(key, list(previous_versions), previous_versions))
+    if payload is None:
+        return
+    await set_cached_data(_versioned(key, list(versions), versions), {**orjson.loads(payload), **changes}, expire_seconds)
+
+
+async def get_or_load(key: str, loader, expire_seconds: int = None):
+    """Read-through lookup: in-process cache, then Redis, then `await loader()`.
+
+    Concurrent misses on the same key share a single `loader()` call, and values
+    close to expiry are refreshed early by one reader while the others keep being
+    served the current value. `loader()` returning None is not cached.
+    Returns `(payload, from_cache)` where payload is the serialized value, or None.
+    """
+    if key is None:
+        _count("db_loads")
+        value = await loader()
+        return (encode(value) if value is not None else None), False
+
+    entry = local_cache.get(key)
+    if entry is not None:
+        if key in _inflight or not entry.should_refresh():
+            _count("l1_hits")
+            return entry.value, True
+    else:
+        entry = await _get_entry(key)
+        if entry is not None:
+            _remember(key, entry)
+            if key in _inflight or not entry.should_refresh():
+                _count("l2_hits")
+                return entry.value, True
+        elif not redis_breaker.available:
+            # Redis is unavailable: serve what the local cache still has
+            entry = local_cache.get(key, stale=True)
+            if entry is not None:
+                _count("stale_hits")
+                return entry.value, True
+
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        value = await asyncio.shield(inflight)
+        if value is not _LOAD_FAILED:
+            _count("coalesced")
+            return value, True
+
+    if entry is not None:
+        _count("early_refreshes")
+    _count("db_loads")
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        started = time.time()
+        value = await loader()
+        payload = None
+        if value is not None:
+            payload = await set_cached_data(key, value, expire_seconds, delta=time.time() - started)
+        future.set_result(payload)
+        return payload, False
+    finally:
+        if not future.done():
+            future.set_result(_LOAD_FAILED)
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+async def get_many(keys):
+    """Serialized payloads for `keys`: the in-process cache first, then one Redis MGET
+    for the rest. Keys that aren't cached are left out of the returned dict."""
+    found = {}
+    remote = []
+    for key in dict.fromkeys(key for key in keys if key is not None):
+        entry = local_cache.get(key)
+        if entry is not None:
+            _count("l1_hits")
+            found[key] = entry.value
+        else:
+            remote.append(key)
+    if not remote:
+        return found
+
     try:
-        await redis_client.set(key, json.dumps(value), ex=expire_seconds)
+        with CACHE_LATENCY.labels("mget").time():
+            cached_values = await redis_breaker.call(redis_client.mget, remote)
     except Exception as e:
-        logger.error("Redis set error: %s", e)
+        log_redis_error("mget", e)
+        for key in remote:
+            entry = local_cache.get(key, stale=True)
+            if entry is not None:
+                _count("stale_hits")
+                found[key] = entry.value
+        return found
+    for key, cached in zip(remote, cached_values):
+        if cached:
+            entry = _decode_entry(cached)
+            _remember(key, entry)
+            _count("l2_hits")
+            found[key] = entry.value
+    return found
+
+
+async def set_many(values: dict, expire_seconds: int = None, delta: float = 0.0):
+    """Store every `key: value` pair with one pipelined round trip. Returns the payloads."""
+    payloads = {}
+    entries = {}
+    expires_at = time.time() + (expire_seconds or settings.CACHE_TTL_SECONDS)
+    for key, value in values.items():
+        payloads[key] = value if isinstance(value, bytes) else encode(value)
+        entries[key] = CacheEntry(payloads[key], delta, expires_at)
+        _remember(key, entries[key])
+    if not entries:
+        return payloads
+
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key, entry in entries.items():
+                pipe.set(key, _encode_entry(entry), ex=_entry_ttl(entry))
+            with CACHE_LATENCY.labels("pipeline").time():
+                await redis_breaker.call(pipe.execute)
+    except Exception as e:
+        log_redis_error("pipeline set", e)
+    return payloads
+
+
+async def get_or_load_many(keys: dict, loader, expire_seconds: int = None):
+    """Batched read-through lookup for `keys`, a dict of `item: cache key`.
+
+    Cached items are read with `get_many`; the rest are passed to one
+    `await loader(missing_items)` call, which returns a dict of `item: value` and
+    leaves out items that don't exist. Loaded values are written back with
+    `set_many`. Returns `(payloads, cached_count)` where payloads maps every found
+    item to its serialized value.
+    """
+    cached = await get_many(keys.values())
+    payloads = {item: cached[key] for item, key in keys.items() if key in cached}
+    missing = [item for item in keys if item not in payloads]
+    if not missing:
+        return payloads, len(payloads)
+
+    cached_count = len(payloads)
+    for _ in missing:
+        _count("db_loads")
+    started = time.time()
+    values = await loader(missing)
+    stored = await set_many(
+        {keys[item]: value for item, value in values.items() if keys[item] is not None},
+        expire_seconds,
+        delta=time.time() - started,
+    )
+    for item, value in values.items():
+        payloads[item] = stored[keys[item]] if keys[item] is not None else encode(value)
+    return payloads, cached_count
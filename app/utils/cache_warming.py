@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import random
+from collections import Counter
+from app.core.config import settings
+from app.utils import cache
+
+logger = logging.getLogger(__name__)
+
+# Sorted set of book ids scored by (sampled, decayed) access counts
+HOT_BOOKS_KEY = "cache:hot_books"
+WARM_LOCK_KEY = "cache:warm:lock"
+
+_sampled = Counter()
+_flushes = set()
+
+
+def record_access(book_ids):
+    """Count a sample of book reads. Samples are gathered in process and added to
+    HOT_BOOKS_KEY once CACHE_WARM_FLUSH_SAMPLES of them are pending, each one
+    counting for 1 / CACHE_WARM_SAMPLE_RATE reads."""
+    rate = settings.CACHE_WARM_SAMPLE_RATE
+    if rate <= 0:
+        return
+    for book_id in book_ids:
+        if random.random() < rate:
+            _sampled[book_id] += 1
+    if sum(_sampled.values()) >= settings.CACHE_WARM_FLUSH_SAMPLES:
+        flush = asyncio.get_running_loop().create_task(flush_access_counts())
+        _flushes.add(flush)
+        flush.add_done_callback(_flushes.discard)
+
+
+async def flush_access_counts():
+    if not _sampled:
+        return
+    counts = dict(_sampled)
+    _sampled.clear()
+    weight = 1 / settings.CACHE_WARM_SAMPLE_RATE
+    try:
+        async with cache.redis_client.pipeline(transaction=False) as pipe:
+            for book_id, count in counts.items():
+                pipe.zincrby(HOT_BOOKS_KEY, count * weight, book_id)
+            await cache.redis_breaker.call(pipe.execute)
+    except Exception as e:
+        cache.log_redis_error("access count", e)
+
+
+async def hot_book_ids(limit: int) -> list:
+    entries = await cache.redis_breaker.call(cache.redis_client.zrevrange, HOT_BOOKS_KEY, 0, limit - 1)
+    return [int(book_id) for book_id in entries]
+
+
+async def decay_access_counts():
+    """Scale every count by CACHE_WARM_DECAY so that past popularity fades, and keep
+    only the CACHE_WARM_MAX_TRACKED hottest books."""
+    async with cache.redis_client.pipeline(transaction=True) as pipe:
+        pipe.zunionstore(HOT_BOOKS_KEY, {HOT_BOOKS_KEY: settings.CACHE_WARM_DECAY})
+        pipe.zremrangebyrank(HOT_BOOKS_KEY, 0, -settings.CACHE_WARM_MAX_TRACKED - 1)
+        await cache.redis_breaker.call(pipe.execute)
+
+
+async def warm_hot_books(session_factory, load_cached_books, top_k: int, batch_size: int, pause: float) -> int:
+    """Build the cached payloads of the `top_k` hottest books that aren't cached yet.
+
+    Books are handled `batch_size` at a time through `load_cached_books(db, book_ids)`
+    (one MGET, one query for the missing books, one pipelined SET), pausing `pause`
+    seconds between batches so warming never competes with traffic for the
+    database. Returns the number of payloads built.
+    """
+    book_ids = await hot_book_ids(top_k)
+    built = 0
+    for start in range(0, len(book_ids), batch_size):
+        if start:
+            await asyncio.sleep(pause)
+        batch = book_ids[start:start + batch_size]
+        async with session_factory() as db:
+            payloads, cached_count = await load_cached_books(db, batch)
+        built += len(payloads) - cached_count
+    logger.info("Warmed the cache of %s hot books, %s were cold", len(book_ids), built)
+    return built
+
+
+async def warm_from_settings(session_factory, load_cached_books) -> int:
+    return await warm_hot_books(
+        session_factory,
+        load_cached_books,
+        settings.CACHE_WARM_TOP_K,
+        settings.CACHE_WARM_BATCH_SIZE,
+        settings.CACHE_WARM_BATCH_PAUSE_SECONDS,
+    )
+
+
+async def run_periodic_warming(session_factory, load_cached_books, interval: float):
+    """Warm the hot books and decay their counts every `interval` seconds. A Redis
+    lock makes sure only one process does it per interval."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush_access_counts()
+            if await cache.redis_breaker.call(cache.redis_client.set, WARM_LOCK_KEY, 1, nx=True, ex=max(1, int(interval) - 1)):
+                await warm_from_settings(session_factory, load_cached_books)
+                await decay_access_counts()
+        except Exception as e:
+            logger.error("Cache warming error: %s", e)
@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, insert, delete, tuple_
+from app.core.config import settings
+from app.db.models.books import Books
+from app.db.models.reviews import Reviews
+from app.db.models.tombstones import Tombstones
+from app.utils.ratings import rating_summary
+
+# Sources of the feed, in the order their changes are listed when they share a timestamp
+SOURCES = ("book", "review", "deleted")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def record_deletions(db, record_type: str, record_ids):
+    """Leave a tombstone for every deleted `record_type` ("book" or "review").
+    A book's tombstone also stands for its reviews, deleted by the cascade."""
+    if record_ids:
+        deleted_at = _now()
+        await db.execute(
+            insert(Tombstones),
+            [{"record_type": record_type, "record_id": record_id, "deleted_at": deleted_at} for record_id in record_ids]
+        )
+
+
+async def purge_tombstones(db, older_than: timedelta) -> int:
+    query = await db.execute(delete(Tombstones).where(Tombstones.deleted_at < _now() - older_than))
+    return query.rowcount
+
+
+def _book_change(book) -> dict:
+    return {
+        "type": "book",
+        "op": "upsert",
+        "id": book.id,
+        "changed_at": book.updated_at,
+        "data": {
+            "name": book.book_name,
+            "author": book.author,
+            "language": book.language,
+            "description": book.description,
+            "created_at": book.created_at,
+            "updated_at": book.updated_at,
+            "version": book.version,
+            **rating_summary(book),
+        },
+    }
+
+
+def _review_change(review) -> dict:
+    return {
+        "type": "review",
+        "op": "upsert",
+        "id": review.id,
+        "changed_at": review.updated_at,
+        "data": {
+            "book_id": review.book_id,
+            "reviewer_name": review.reviewer_name,
+            "ratings": review.ratings,
+            "review": review.review,
+            "created_at": review.created_at,
+            "updated_at": review.updated_at,
+            "version": review.version,
+        },
+    }
+
+
+def _tombstone_change(tombstone) -> dict:
+    return {
+        "type": tombstone.record_type,
+        "op": "delete",
+        "id": tombstone.record_id,
+        "changed_at": tombstone.deleted_at,
+        "data": None,
+    }
+
+
+# source: (model, timestamp column, change builder)
+_FEEDS = {
+    "book": (Books, Books.updated_at, _book_change),
+    "review": (Reviews, Reviews.updated_at, _review_change),
+    "deleted": (Tombstones, Tombstones.deleted_at, _tombstone_change),
+}
+
+
+def parse_cursor(values: dict) -> dict:
+    """Decoded cursor: for every source the (timestamp, id) of the last change
+    already returned, None when read from the start, `synced_at`, the time up to
+    which the consumer last received every change, and `started_at`, the time the
+    initial sync started, kept until the consumer first catches up."""
+    cursor = {}
+    for source in SOURCES:
+        position = values.get(source)
+        cursor[source] = (datetime.fromisoformat(position[0]), int(position[1])) if position else None
+    for field in ("synced_at", "started_at"):
+        cursor[field] = datetime.fromisoformat(values[field]) if values.get(field) else None
+    return cursor
+
+
+def cursor_values(cursor: dict) -> dict:
+    values = {source: [cursor[source][0].isoformat(), cursor[source][1]] for source in SOURCES if cursor[source]}
+    if cursor["synced_at"]:
+        values["synced_at"] = cursor["synced_at"].isoformat()
+    elif cursor["started_at"]:
+        values["started_at"] = cursor["started_at"].isoformat()
+    return values
+
+
+def cursor_expired(cursor: dict) -> bool:
+    """Whether tombstones the consumer hasn't received may have been purged. Only
+    tombstones older than the retention are, and the consumer received every
+    change before `synced_at`. During the initial sync it can only miss the
+    deletion of records it received, which happened after `started_at`."""
+    since = cursor["synced_at"] or cursor["started_at"]
+    if since is None:
+        # A fresh cursor, or one read from without recording either time
+        return any(cursor[source] for source in SOURCES)
+    return since < _now() - timedelta(days=settings.CHANGES_TOMBSTONE_RETENTION_DAYS)
+
+
+async def load_changes(db, cursor: dict, limit: int):
+    """Up to `limit` changes after `cursor`, ordered by (timestamp, source, id).
+
+    Each source is read by keyset on its (timestamp, id) index, then the three are
+    merged, so a page costs O(limit) whatever the size of the catalogue. Changes
+    younger than CHANGES_SETTLE_SECONDS are left for a later call. Returns the
+    changes, the next cursor and whether more changes are ready.
+    """
+    now = _now()
+    settled_before = now - timedelta(seconds=settings.CHANGES_SETTLE_SECONDS)
+    candidates = []
+    for rank, source in enumerate(SOURCES):
+        model, changed_at, build = _FEEDS[source]
+        statement = (
+            select(model)
+            .where(changed_at < settled_before)
+            .order_by(changed_at, model.id)
+            .limit(limit + 1)
+        )
+        if cursor[source]:
+            statement = statement.where(tuple_(changed_at, model.id) > tuple_(*cursor[source]))
+        query = await db.execute(statement)
+        for row in query.scalars():
+            change = build(row)
+            candidates.append((change["changed_at"], rank, row.id, source, change))
+
+    candidates.sort(key=lambda candidate: candidate[:3])
+    page = candidates[:limit]
+    has_more = len(candidates) > limit
+    cursor = dict(cursor)
+    if not cursor["synced_at"] and not cursor["started_at"]:
+        cursor["started_at"] = now
+    for changed_at, _, row_id, source, _ in page:
+        cursor[source] = (changed_at, row_id)
+    if not has_more:
+        cursor["synced_at"] = settled_before
+    return [change for *_, change in page], cursor, has_more
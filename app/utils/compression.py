@@ -0,0 +1,171 @@
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+from app.core.config import settings
+from app.utils.cache import LocalCache
+from app.utils.metrics import COMPRESSED_RESPONSES
+
+# Brotli and zstd are optional: without their package the encoding isn't offered
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Levels for compressing on the fly, and higher ones for the cached variants,
+# which are compressed once and then served many times
+LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+CACHED_LEVELS = {"zstd": 9, "br": 9, "gzip": 9}
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def _supported(encoding: str) -> bool:
+    if encoding == "br":
+        return brotli is not None
+    if encoding == "zstd":
+        return zstandard is not None
+    return encoding == "gzip"
+
+
+# Offered encodings, in the server's order of preference
+ENCODINGS = [
+    encoding.strip() for encoding in settings.COMPRESSION_ENCODINGS.split(",")
+    if _supported(encoding.strip())
+]
+
+
+def negotiate(accept_encoding: str):
+    """Preferred encoding among those the client accepts, None for identity."""
+    if not settings.COMPRESSION_ENABLED or not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    candidates = [encoding for encoding in ENCODINGS if accepted.get(encoding, wildcard) > 0]
+    if not candidates:
+        return None
+    # Highest client quality first, the server's preference among equals
+    return max(candidates, key=lambda encoding: accepted.get(encoding, wildcard))
+
+
+class _Encoder:
+    """Streaming compressor with the same interface for every encoding."""
+
+    def __init__(self, encoding: str, level: int):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+            self.compress, self.flush = self._compressor.process, self._compressor.finish
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+            self.compress, self.flush = self._compressor.compress, self._compressor.flush
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.compress, self.flush = self._compressor.compress, self._compressor.flush
+
+
+def compress(data: bytes, encoding: str, level: int = None) -> bytes:
+    encoder = _Encoder(encoding, level or LEVELS[encoding])
+    return encoder.compress(data) + encoder.flush()
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+# Compressed bodies of cached responses, keyed by encoding, ETag and envelope. The
+# ETag hashes the cached payload, so an entry never goes stale, it only gets evicted
+compressed_bodies = LocalCache(settings.COMPRESSION_CACHE_MAX_ENTRIES)
+
+
+def cached_compressed_body(key, encoding: str, render):
+    """Compressed body stored under `key`, else `render()` compressed and stored.
+    Returns None, uncompressed, when the rendered body is below the size threshold."""
+    body = compressed_bodies.get((encoding, key))
+    if body is not None:
+        COMPRESSED_RESPONSES.labels(encoding, "cached").inc()
+        return body
+    raw = render()
+    if len(raw) < settings.COMPRESSION_MIN_SIZE:
+        return None
+    body = compress(raw, encoding, CACHED_LEVELS[encoding])
+    compressed_bodies.set((encoding, key), body, settings.CACHE_TTL_SECONDS)
+    COMPRESSED_RESPONSES.labels(encoding, "compressed").inc()
+    return body
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing JSON and text responses of at least
+    COMPRESSION_MIN_SIZE bytes with the encoding negotiated from Accept-Encoding.
+
+    Responses that already carry a Content-Encoding (e.g. precompressed cached
+    responses) are passed through. Streamed responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        start = None
+        encoder = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk tells whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(raw=start["headers"])
+                compressible = is_compressible(headers.get("content-type", "")) and "content-encoding" not in headers
+                if compressible and "accept-encoding" not in headers.get("vary", "").lower():
+                    headers.add_vary_header("Accept-Encoding")
+                if not compressible or encoding is None or (not more_body and len(body) < settings.COMPRESSION_MIN_SIZE):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                headers["Content-Encoding"] = encoding
+                COMPRESSED_RESPONSES.labels(encoding, "compressed").inc()
+                encoder = _Encoder(encoding, LEVELS[encoding])
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = encoder.compress(body) + encoder.flush()
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start)
+
+            chunk = encoder.compress(body)
+            if not more_body:
+                chunk += encoder.flush()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
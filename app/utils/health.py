@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from sqlalchemy import text
+from app.utils import cache
+
+logger = logging.getLogger(__name__)
+
+# Set by the app lifespan once the connection pools are warmed up
+state = {"warmed_up": False}
+
+
+async def _ping_database(engine):
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def warm_up_database(engine, connections: int):
+    """Open `connections` pooled connections at once, so they are kept by the pool."""
+    if connections <= 0:
+        return
+    try:
+        await asyncio.gather(*(_ping_database(engine) for _ in range(connections)))
+    except Exception as e:
+        logger.warning("Database warm up failed: %s", e)
+
+
+async def warm_up_redis(connections: int):
+    if connections <= 0:
+        return
+    try:
+        await asyncio.gather(*(cache.redis_client.ping() for _ in range(connections)))
+    except Exception as e:
+        logger.warning("Redis warm up failed: %s", e)
+
+
+async def _check(name: str, check, timeout: float):
+    try:
+        await asyncio.wait_for(check, timeout)
+        return name, "ok"
+    except asyncio.TimeoutError:
+        return name, f"timed out after {timeout}s"
+    except Exception as e:
+        return name, str(e) or type(e).__name__
+
+
+async def readiness(engines, timeout: float) -> dict:
+    """Check every engine and Redis concurrently, each within `timeout` seconds."""
+    checks = [_check("database" if index == 0 else f"database_{index}", _ping_database(engine), timeout)
+              for index, engine in enumerate(engines)]
+    checks.append(_check("redis", cache.redis_client.ping(), timeout))
+    return dict(await asyncio.gather(*checks))
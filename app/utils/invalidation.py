@@ -0,0 +1,61 @@
+from itertools import chain
+from sqlalchemy import event
+from app.db.models.books import Books
+from app.db.models.reviews import Reviews
+from app.utils.cache import bump_versions
+
+PENDING_TAGS = "cache_tags"
+COMMITTED_TAGS = "committed_cache_tags"
+
+
+def book_tags(book_id: int) -> set:
+    return {"books", f"book:{book_id}", f"book:{book_id}:reviews"}
+
+
+def review_tags(book_id: int, review_id: int) -> set:
+    return {"ratings", f"book:{book_id}", f"book:{book_id}:reviews", f"review:{review_id}"}
+
+
+def cache_tags_for(obj):
+    """Cache tags whose cached payloads embed `obj`."""
+    if isinstance(obj, Books):
+        return book_tags(obj.id)
+    if isinstance(obj, Reviews):
+        return review_tags(obj.book_id, obj.id)
+    return set()
+
+
+def add_cache_tags(session, *tags):
+    """Register tags for writes the ORM can't see, e.g. Core UPDATE/DELETE statements."""
+    session.info.setdefault(PENDING_TAGS, set()).update(tags)
+
+
+def _collect_tags(session, flush_context):
+    tags = session.info.setdefault(PENDING_TAGS, set())
+    for obj in chain(session.new, session.deleted):
+        tags.update(cache_tags_for(obj))
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            tags.update(cache_tags_for(obj))
+
+
+def _commit_tags(session):
+    pending = session.info.pop(PENDING_TAGS, None)
+    if pending:
+        session.info.setdefault(COMMITTED_TAGS, set()).update(pending)
+
+
+def _discard_tags(session):
+    session.info.pop(PENDING_TAGS, None)
+
+
+def track_cache_tags(session_class):
+    event.listen(session_class, "after_flush", _collect_tags)
+    event.listen(session_class, "after_commit", _commit_tags)
+    event.listen(session_class, "after_rollback", _discard_tags)
+
+
+async def invalidate_committed(session):
+    tags = session.info.pop(COMMITTED_TAGS, None)
+    if tags:
+        await bump_versions(tags)
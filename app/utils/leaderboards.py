@@ -0,0 +1,237 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import event, func, select
+from app.core.config import settings
+from app.db.models.books import Books
+from app.db.models.reviews import Reviews
+from app.utils import cache
+
+logger = logging.getLogger(__name__)
+
+TOP_RATED_KEY = "leaderboard:top_rated"
+# Union of the daily review counts below, weighted by age; recomputed when it expires
+TRENDING_KEY = "leaderboard:trending"
+# Zero score member keeping TRENDING_KEY in existence when no book was reviewed in
+# the window, so an empty ranking is cached like any other; never returned
+TRENDING_COMPUTED_MEMBER = "computed"
+REBUILD_LOCK_KEY = "leaderboard:rebuild:lock"
+PENDING_CHANGES = "leaderboard_changes"
+COMMITTED_CHANGES = "committed_leaderboard_changes"
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _day_key(day: date) -> str:
+    return f"leaderboard:reviews:{day.isoformat()}"
+
+
+def _window_days():
+    today = _today()
+    return [today - timedelta(days=age) for age in range(settings.LEADERBOARD_TRENDING_WINDOW_DAYS)]
+
+
+def top_rated_score(review_count: int, rating_sum: int) -> float:
+    """Bayesian average: the mean rating pulled towards LEADERBOARD_PRIOR_RATING by
+    LEADERBOARD_PRIOR_WEIGHT virtual reviews, so one 5 star review doesn't top the list."""
+    prior_weight = settings.LEADERBOARD_PRIOR_WEIGHT
+    return (prior_weight * settings.LEADERBOARD_PRIOR_RATING + rating_sum) / (prior_weight + review_count)
+
+
+top_rated_expression = (
+    (settings.LEADERBOARD_PRIOR_WEIGHT * settings.LEADERBOARD_PRIOR_RATING + Books.rating_sum) * 1.0
+    / (settings.LEADERBOARD_PRIOR_WEIGHT + Books.review_count)
+)
+
+
+def _changes(session) -> dict:
+    return session.info.setdefault(PENDING_CHANGES, {"scores": {}, "reviews": Counter(), "removed": set()})
+
+
+def record_rating(session, book_id: int, review_count: int, rating_sum: int):
+    """Queue the top rated score of a book whose aggregates changed in this transaction."""
+    _changes(session)["scores"][book_id] = top_rated_score(review_count, rating_sum) if review_count else None
+
+
+def record_reviews(session, book_id: int, created_at=None, count: int = 1):
+    """Queue `count` reviews added to (or, negative, removed from) the day of `created_at`."""
+    day = (created_at or datetime.now(timezone.utc)).date()
+    if day in _window_days():
+        _changes(session)["reviews"][(book_id, day)] += count
+
+
+def record_book_removed(session, book_id: int):
+    changes = _changes(session)
+    changes["scores"][book_id] = None
+    changes["removed"].add(book_id)
+
+
+def _commit_changes(session):
+    pending = session.info.pop(PENDING_CHANGES, None)
+    if not pending:
+        return
+    committed = session.info.setdefault(COMMITTED_CHANGES, {"scores": {}, "reviews": Counter(), "removed": set()})
+    committed["scores"].update(pending["scores"])
+    committed["reviews"].update(pending["reviews"])
+    committed["removed"].update(pending["removed"])
+
+
+def _discard_changes(session):
+    session.info.pop(PENDING_CHANGES, None)
+
+
+def track_leaderboard_changes(session_class):
+    event.listen(session_class, "after_commit", _commit_changes)
+    event.listen(session_class, "after_rollback", _discard_changes)
+
+
+async def apply_committed(session):
+    """Apply the committed changes of `session` to the sorted sets in one pipeline."""
+    changes = session.info.pop(COMMITTED_CHANGES, None)
+    if not changes:
+        return
+    try:
+        async with cache.redis_client.pipeline(transaction=False) as pipe:
+            scores = {book_id: score for book_id, score in changes["scores"].items() if score is not None}
+            if scores:
+                pipe.zadd(TOP_RATED_KEY, scores)
+            unrated = [book_id for book_id, score in changes["scores"].items() if score is None]
+            if unrated:
+                pipe.zrem(TOP_RATED_KEY, *unrated)
+
+            removed = changes["removed"]
+            for (book_id, day), count in changes["reviews"].items():
+                if count and book_id not in removed:
+                    pipe.zincrby(_day_key(day), count, book_id)
+                    pipe.expire(_day_key(day), (settings.LEADERBOARD_TRENDING_WINDOW_DAYS + 1) * 86400)
+            if removed:
+                for day in _window_days():
+                    pipe.zrem(_day_key(day), *removed)
+                pipe.zrem(TRENDING_KEY, *removed)
+            await cache.redis_breaker.call(pipe.execute)
+    except Exception as e:
+        cache.log_redis_error("leaderboard update", e)
+
+
+async def _refresh_trending():
+    """Rebuild TRENDING_KEY from the daily counts, each day weighted by
+    0.5 ** (age / half-life), so a review's weight decays as it ages."""
+    days = _window_days()
+    weights = {
+        _day_key(day): 0.5 ** (age / settings.LEADERBOARD_TRENDING_HALF_LIFE_DAYS)
+        for age, day in enumerate(days)
+    }
+    async with cache.redis_client.pipeline(transaction=True) as pipe:
+        pipe.zunionstore(TRENDING_KEY, weights)
+        pipe.zadd(TRENDING_KEY, {TRENDING_COMPUTED_MEMBER: 0})
+        pipe.expire(TRENDING_KEY, settings.LEADERBOARD_TRENDING_REFRESH_SECONDS)
+        await cache.redis_breaker.call(pipe.execute)
+
+
+async def leaderboard_entries(board: str, limit: int):
+    """Top `limit` (book_id, score) of `board` from Redis, or None when Redis fails."""
+    try:
+        key = TOP_RATED_KEY if board == "top_rated" else TRENDING_KEY
+        if board == "trending" and not await cache.redis_breaker.call(cache.redis_client.exists, TRENDING_KEY):
+            await _refresh_trending()
+        entries = await cache.redis_breaker.call(cache.redis_client.zrevrange, key, 0, limit - 1, withscores=True)
+    except Exception as e:
+        cache.log_redis_error("leaderboard read", e)
+        return None
+    return [(int(book_id), score) for book_id, score in entries if score > 0]
+
+
+async def leaderboard_from_db(db, board: str, limit: int):
+    """Fallback for leaderboard_entries. Trending counts the reviews of the window
+    without decaying them."""
+    if board == "top_rated":
+        query = await db.execute(
+            select(Books.id, top_rated_expression)
+            .where(Books.review_count > 0)
+            .order_by(top_rated_expression.desc(), Books.id)
+            .limit(limit)
+        )
+    else:
+        since = datetime.combine(_window_days()[-1], datetime.min.time())
+        review_count = func.count(Reviews.id)
+        query = await db.execute(
+            select(Reviews.book_id, review_count)
+            .where(Reviews.created_at >= since)
+            .group_by(Reviews.book_id)
+            .order_by(review_count.desc(), Reviews.book_id)
+            .limit(limit)
+        )
+    return [(book_id, float(score)) for book_id, score in query.all()]
+
+
+async def _replace_sorted_set(key: str, members: dict, batch_size: int, expire_seconds: int = None):
+    """Write `members` under a temporary key and swap it in with RENAME, so readers
+    never see a half-built set."""
+    building = f"{key}:rebuild"
+    await cache.redis_client.delete(building)
+    items = list(members.items())
+    for start in range(0, len(items), batch_size):
+        await cache.redis_client.zadd(building, dict(items[start:start + batch_size]))
+    async with cache.redis_client.pipeline(transaction=True) as pipe:
+        if items:
+            pipe.rename(building, key)
+            if expire_seconds:
+                pipe.expire(key, expire_seconds)
+        else:
+            pipe.delete(key)
+        await pipe.execute()
+
+
+async def rebuild_leaderboards(db, batch_size: int = 1000):
+    """Recompute every sorted set from the database, fixing any drift of the
+    incremental updates. Returns the number of books in each leaderboard."""
+    scores = {}
+    result = await db.stream(
+        select(Books.id, Books.review_count, Books.rating_sum)
+        .where(Books.review_count > 0)
+        .execution_options(yield_per=batch_size)
+    )
+    async for book_id, review_count, rating_sum in result:
+        scores[book_id] = top_rated_score(review_count, rating_sum)
+    await _replace_sorted_set(TOP_RATED_KEY, scores, batch_size)
+
+    days = _window_days()
+    since = datetime.combine(days[-1], datetime.min.time())
+    day = func.date(Reviews.created_at)
+    query = await db.execute(
+        select(Reviews.book_id, day, func.count(Reviews.id))
+        .where(Reviews.created_at >= since)
+        .group_by(Reviews.book_id, day)
+    )
+    counts = {day: {} for day in days}
+    for book_id, review_day, review_count in query.all():
+        review_day = review_day if isinstance(review_day, date) else date.fromisoformat(str(review_day)[:10])
+        if review_day in counts:
+            counts[review_day][book_id] = review_count
+    for review_day, members in counts.items():
+        await _replace_sorted_set(
+            _day_key(review_day), members, batch_size, (settings.LEADERBOARD_TRENDING_WINDOW_DAYS + 1) * 86400
+        )
+    await cache.redis_client.delete(TRENDING_KEY)
+
+    trending = set()
+    for members in counts.values():
+        trending.update(members)
+    return {"top_rated": len(scores), "trending": len(trending)}
+
+
+async def run_periodic_rebuild(session_factory, interval: float):
+    """Rebuild the leaderboards every `interval` seconds. A Redis lock makes sure
+    only one process rebuilds per interval."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await cache.redis_client.set(REBUILD_LOCK_KEY, 1, nx=True, ex=max(1, int(interval) - 1)):
+                async with session_factory() as db:
+                    counts = await rebuild_leaderboards(db)
+                logger.info("Rebuilt leaderboards: %s", counts)
+        except Exception as e:
+            logger.error("Leaderboard rebuild error: %s", e)
@@ -0,0 +1,104 @@
+import os
+import time
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from starlette.datastructures import MutableHeaders
+from app.core.config import settings
+from app.db.metrics import start_request_stats, finish_request_stats
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status code", ["method", "route", "status"])
+DB_QUERIES = Histogram(
+    "db_queries_per_request", "Database queries issued per request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+)
+DB_TIME = Histogram(
+    "db_query_seconds_per_request", "Time spent in database queries per request",
+    ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+CACHE_LATENCY = Histogram(
+    "cache_redis_operation_seconds", "Redis operation latency in the cache layer",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by outcome", ["result"])
+RATE_LIMITED = Counter("rate_limited_requests_total", "Requests rejected with 429 by the rate limiter")
+REVIEW_QUEUE_DEPTH = Gauge("review_queue_depth", "Reviews waiting in the write-behind queue", multiprocess_mode="livesum")
+REVIEW_QUEUE_REVIEWS = Counter("review_queue_reviews_total", "Reviews through the write-behind queue by outcome", ["result"])
+COMPRESSED_RESPONSES = Counter(
+    "http_compressed_responses_total",
+    "Compressed responses by encoding, compressed for the request or served from the compressed cache",
+    ["encoding", "source"]
+)
+DB_SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than DB_SLOW_QUERY_SECONDS by route", ["route"])
+DB_REPEATED_STATEMENTS = Counter(
+    "db_repeated_statement_requests_total", "Requests repeating a statement at least DB_REPEATED_STATEMENT_THRESHOLD times (N+1)", ["route"]
+)
+DB_POOL_CONNECTIONS = Gauge("db_pool_connections", "Connection pool state", ["pool", "state"], multiprocess_mode="livesum")
+
+
+def _route_path(scope) -> str:
+    """Path template of the matched route, e.g. /api/books/{book_id}/reviews."""
+    # include_router copies routes with the router prefix already in their path
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status codes and DB usage per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        stats = start_request_stats(f"{scope['method']} {scope['path']}")
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.DB_DEBUG_HEADERS:
+                    MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = _route_path(scope)
+            method = scope["method"]
+            REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            DB_QUERIES.labels(route).observe(stats.queries)
+            DB_TIME.labels(route).observe(stats.duration)
+            if stats.slow_queries:
+                DB_SLOW_QUERIES.labels(route).inc(stats.slow_queries)
+            if stats.repeated_statements():
+                DB_REPEATED_STATEMENTS.labels(route).inc()
+            finish_request_stats(stats)
+
+
+def render_metrics(pool_stats: dict) -> bytes:
+    for pool, status in pool_stats.items():
+        for state, value in status.items():
+            DB_POOL_CONNECTIONS.labels(pool, state).set(value)
+
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
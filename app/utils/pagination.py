@@ -0,0 +1,18 @@
+import base64
+import json
+
+
+def encode_cursor(values: dict) -> str:
+    payload = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError as err:
+        raise ValueError("Invalid cursor") from err
+    if not isinstance(values, dict):
+        raise ValueError("Invalid cursor")
+    return values
@@ -0,0 +1,235 @@
+import hashlib
+import math
+import time
+from urllib.parse import parse_qs
+from fastapi import status
+from app.core.config import settings
+from app.utils import cache
+from app.utils.cache import LocalCache
+from app.utils.metrics import RATE_LIMITED
+from app.utils.response import create_response
+
+# Cost in tokens of a request, by method and path (without the trailing slash).
+# Unlisted requests cost DEFAULT_COST; a cost of 0 is never limited.
+ROUTE_COSTS = {
+    ("GET", "/api/books/export"): 50,
+    ("POST", "/api/books/bulk"): 20,
+    ("POST", "/api/reviews/bulk"): 20,
+    ("POST", "/api/books/bulk-delete"): 20,
+    ("GET", "/api/books/batch"): 5,
+    ("POST", "/api/books/batch"): 5,
+    ("GET", "/api/books/search"): 2,
+    ("GET", "/api/books/changes"): 5,
+    ("GET", "/metrics"): 0,
+    ("GET", "/healthz"): 0,
+    ("GET", "/readyz"): 0,
+}
+DEFAULT_COST = 1
+# GET /api/books without book_id reads a page of the catalogue
+LISTING_COST = 5
+
+# Token bucket stored as a hash of (tokens, ts). Refills at ARGV[1] tokens/s up to
+# ARGV[2] and takes back the ARGV[5] unused tokens of the caller's previous lease,
+# then hands out up to ARGV[3] tokens as long as at least ARGV[4] (the cost of the
+# current request) are available. Returns the granted tokens and, when nothing was
+# granted, the seconds until the cost is available again.
+LEASE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local wanted = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local returned = tonumber(ARGV[5])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate + returned)
+
+local granted = 0
+local retry_after = 0
+if tokens >= cost then
+    granted = math.max(cost, math.min(wanted, math.floor(tokens)))
+    tokens = tokens - granted
+else
+    retry_after = (cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {granted, tostring(retry_after)}
+"""
+
+
+def request_cost(scope) -> int:
+    if scope["method"] == "OPTIONS":
+        return 0
+    path = scope["path"].rstrip("/") or "/"
+    if scope["method"] == "GET" and path == f"{settings.API_V1_STR}/books":
+        book_id = parse_qs(scope.get("query_string", b"").decode()).get("book_id")
+        return DEFAULT_COST if book_id and book_id[0] else LISTING_COST
+    return ROUTE_COSTS.get((scope["method"], path), DEFAULT_COST)
+
+
+API_KEYS = {key.strip() for key in settings.RATE_LIMIT_API_KEYS.split(",") if key.strip()}
+
+
+def _client_ip(scope, headers) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR and b"x-forwarded-for" in headers:
+        return headers[b"x-forwarded-for"].decode(errors="replace").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def client_key(scope):
+    """Bucket of the request: its API key when it is one of RATE_LIMIT_API_KEYS,
+    its IP address otherwise. Returns `(key, unknown_api_key)`, the latter True
+    when the client sent a key that isn't configured."""
+    headers = dict(scope.get("headers") or [])
+    api_key = headers.get(settings.RATE_LIMIT_API_KEY_HEADER.lower().encode(), b"").decode(errors="replace")
+    if api_key in API_KEYS:
+        # Hashed, so keys don't end up in Redis key names
+        return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:32], False
+    return "ip:" + _client_ip(scope, headers), bool(api_key)
+
+
+class TokenBucket:
+    """In-process token bucket: holds the tokens leased from Redis, or is the whole
+    bucket when Redis is unavailable."""
+
+    __slots__ = ("tokens", "updated_at", "blocked_until", "expires_at")
+
+    def __init__(self, tokens: float = 0.0, expires_at: float = math.inf):
+        self.tokens = tokens
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.expires_at = expires_at
+
+    def refill(self, rate: float, burst: float):
+        now = time.monotonic()
+        self.tokens = min(burst, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+
+
+class RateLimiter:
+    """Token buckets per client, shared by all processes through Redis.
+
+    Each process leases up to `lease_size` tokens at a time from the client's Redis
+    bucket and spends them locally, so only one request in `lease_size` costs a
+    Redis round trip. A denied client is remembered until its Retry-After. Leases
+    expire after `lease_ttl` seconds so tokens can't be hoarded, and the unused
+    tokens of an expired or exhausted lease go back to the Redis bucket with the
+    next lease, so a client is only charged for what it spent. Across N processes
+    a client can overshoot by at most N leases.
+    """
+
+    def __init__(self, rate: float, burst: int, lease_size: int, lease_ttl: float, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        self.lease_size = lease_size
+        self.lease_ttl = lease_ttl
+        self._leases = LocalCache(max_clients)
+        self._fallback = LocalCache(max_clients)
+        self._script = None
+
+    async def acquire(self, client: str, cost: int):
+        """Take `cost` tokens for `client`. Returns (allowed, retry_after seconds)."""
+        now = time.monotonic()
+        lease = self._leases.get(client)
+        if lease is not None:
+            if lease.blocked_until > now:
+                return False, lease.blocked_until - now
+            if lease.expires_at > now and lease.tokens >= cost:
+                lease.tokens -= cost
+                return True, 0.0
+
+        unused = lease.tokens if lease is not None else 0
+        try:
+            granted, retry_after = await self._lease(client, cost, unused)
+        except Exception as e:
+            cache.log_redis_error("rate limit", e)
+            return self._acquire_locally(client, cost)
+
+        # Kept past its expiry until the bucket would be full again anyway, so its
+        # unused tokens can still be returned
+        keep_for = self.burst / self.rate + 1
+        if not granted:
+            lease = TokenBucket()
+            lease.blocked_until = now + retry_after
+            self._leases.set(client, lease, keep_for)
+            return False, retry_after
+
+        self._leases.set(client, TokenBucket(granted - cost, now + self.lease_ttl), keep_for)
+        return True, 0.0
+
+    async def _lease(self, client: str, cost: int, unused: int = 0):
+        if self._script is None:
+            self._script = cache.redis_client.register_script(LEASE_SCRIPT)
+        granted, retry_after = await cache.redis_breaker.call(
+            self._script,
+            keys=[f"ratelimit:{client}"],
+            args=[self.rate, self.burst, max(self.lease_size, cost), cost, unused],
+            client=cache.redis_client,
+        )
+        return int(granted), float(retry_after)
+
+    def _acquire_locally(self, client: str, cost: int):
+        bucket = self._fallback.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.burst)
+            self._fallback.set(client, bucket, self.burst / self.rate + 1)
+        bucket.refill(self.rate, self.burst)
+        if bucket.tokens >= cost:
+            bucket.tokens -= cost
+            return True, 0.0
+        return False, (cost - bucket.tokens) / self.rate
+
+
+rate_limiter = RateLimiter(
+    settings.RATE_LIMIT_PER_SECOND,
+    settings.RATE_LIMIT_BURST,
+    settings.RATE_LIMIT_LEASE_SIZE,
+    settings.RATE_LIMIT_LEASE_TTL_SECONDS,
+    settings.CACHE_L1_MAX_ENTRIES,
+)
+# Requests with an unknown API key, per IP, so keys can't be guessed at full speed
+invalid_key_limiter = RateLimiter(
+    settings.RATE_LIMIT_INVALID_KEY_PER_SECOND,
+    settings.RATE_LIMIT_INVALID_KEY_BURST,
+    1,
+    settings.RATE_LIMIT_LEASE_TTL_SECONDS,
+    settings.CACHE_L1_MAX_ENTRIES,
+)
+
+
+class RateLimitMiddleware:
+    """ASGI middleware answering 429 with Retry-After once a client runs out of tokens."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        cost = request_cost(scope)
+        if cost:
+            key, unknown_api_key = client_key(scope)
+            allowed, retry_after = True, 0.0
+            if unknown_api_key:
+                allowed, retry_after = await invalid_key_limiter.acquire("invalid-key:" + key, 1)
+            if allowed:
+                allowed, retry_after = await rate_limiter.acquire(key, cost)
+            if not allowed:
+                RATE_LIMITED.inc()
+                response = create_response(
+                    status.HTTP_429_TOO_MANY_REQUESTS,
+                    "Too many requests, retry later",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+                )
+                await response(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,84 @@
+from collections import Counter
+from sqlalchemy import update, case, func, select
+from app.db.models.books import Books
+from app.db.models.reviews import Reviews
+from app.utils.leaderboards import record_rating
+
+RATING_VALUES = (1, 2, 3, 4, 5)
+
+
+def histogram_column(rating: int):
+    """Histogram counter of `rating`, None for ratings outside RATING_VALUES.
+
+    The schema validates ratings, but rows written before that may hold others:
+    they count toward the review count and sum, just not the histogram."""
+    if rating not in RATING_VALUES:
+        return None
+    return getattr(Books, f"rating_{rating}_count")
+
+
+# SQL expression for the average rating, NULL for books without reviews
+avg_rating_expression = case(
+    (Books.review_count > 0, Books.rating_sum * 1.0 / Books.review_count),
+    else_=None
+)
+
+
+def rating_change(book_id: int, added=(), removed=()):
+    """UPDATE statement applying added/removed review ratings to a book's aggregates."""
+    values = {}
+    count_delta = len(added) - len(removed)
+    sum_delta = sum(added) - sum(removed)
+    if count_delta:
+        values["review_count"] = Books.review_count + count_delta
+    if sum_delta:
+        values["rating_sum"] = Books.rating_sum + sum_delta
+
+    histogram_delta = Counter(added)
+    histogram_delta.subtract(removed)
+    for rating, delta in histogram_delta.items():
+        column = histogram_column(rating)
+        # Out of range ratings have no bucket, as in recompute_ratings
+        if delta and column is not None:
+            values[column.key] = column + delta
+
+    if not values:
+        return None
+    return update(Books).where(Books.id == book_id).values(**values)
+
+
+async def apply_rating_change(db, book_id: int, added=(), removed=()):
+    """Execute `rating_change` and queue the book's new top rated score."""
+    statement = rating_change(book_id, added, removed)
+    if statement is None:
+        return
+    query = await db.execute(statement.returning(Books.review_count, Books.rating_sum))
+    row = query.first()
+    if row is not None:
+        record_rating(db, book_id, row.review_count, row.rating_sum)
+
+
+def recompute_ratings(book_ids):
+    """UPDATE statement recomputing the aggregates of `book_ids` from their reviews."""
+    def aggregate(expression):
+        return (
+            select(func.coalesce(expression, 0))
+            .where(Reviews.book_id == Books.id)
+            .scalar_subquery()
+        )
+
+    values = {
+        "review_count": aggregate(func.count(Reviews.id)),
+        "rating_sum": aggregate(func.sum(Reviews.ratings)),
+    }
+    for rating in RATING_VALUES:
+        values[histogram_column(rating).key] = aggregate(func.sum(case((Reviews.ratings == rating, 1), else_=0)))
+    return update(Books).where(Books.id.in_(book_ids)).values(**values)
+
+
+def rating_summary(book) -> dict:
+    return {
+        "review_count": book.review_count,
+        "avg_rating": round(book.rating_sum / book.review_count, 2) if book.review_count else None,
+        "rating_histogram": {str(rating): getattr(book, histogram_column(rating).key) for rating in RATING_VALUES},
+    }
@@ -1,7 +1,23 @@
+from fastapi import Request, Response, status
 from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.utils.compression import negotiate, cached_compressed_body
+import hashlib
+import orjson
 
 
-def create_response(status_code, message=None, data=None, detail=None):
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson.
+
+    Serializes datetimes natively and splices `orjson.Fragment` values (e.g. payloads
+    straight from the cache) into the body without decoding them.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def create_response(status_code, message=None, data=None, detail=None, headers=None):
     content = {
         "status_code": status_code,
         "message": message,
@@ -13,4 +29,54 @@ def create_response(status_code, message=None, data=None, detail=None):
     if detail is not None:
         content["detail"] = detail
 
-    return JSONResponse(content=content, status_code=status_code)
\ No newline at end of file
+    return ORJSONResponse(content=content, status_code=status_code, headers=headers)
+
+
+def etag_for(*payloads: bytes) -> str:
+    """ETag of serialized payloads, usually straight from the cache.
+
+    Weak, as the response envelope around the payloads (e.g. the message saying
+    whether it came from the cache) may differ between equivalent responses.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for payload in payloads:
+        digest.update(len(payload).to_bytes(8, "big"))
+        digest.update(payload)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def cacheable_response(request: Request, message, data, etag: str):
+    """200 response with ETag and Cache-Control headers, or an empty 304 when the
+    client's If-None-Match already has `etag`.
+
+    The body is compressed once per ETag and encoding, then served from the
+    compressed cache. The weak ETag stays the same whatever the encoding.
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.HTTP_CACHE_MAX_AGE}, s-maxage={settings.HTTP_CACHE_SHARED_MAX_AGE}",
+    }
+    if settings.COMPRESSION_ENABLED:
+        headers["Vary"] = "Accept-Encoding"
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    encoding = negotiate(request.headers.get("accept-encoding"))
+    if encoding is not None:
+        body = cached_compressed_body(
+            (request.url.path, etag, message),
+            encoding,
+            lambda: create_response(status.HTTP_200_OK, message, data=data).body
+        )
+        if body is not None:
+            return Response(body, media_type="application/json", headers={**headers, "Content-Encoding": encoding})
+    return create_response(status.HTTP_200_OK, message, data=data, headers=headers)
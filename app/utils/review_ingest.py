@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from sqlalchemy import select, insert
+from sqlalchemy.exc import DBAPIError, IntegrityError, OperationalError
+from app.core.config import settings
+from app.db.models.books import Books
+from app.db.models.reviews import Reviews
+from app.db.session import SessionLocal
+from app.utils.invalidation import add_cache_tags
+from app.utils.leaderboards import record_reviews
+from app.utils.metrics import REVIEW_QUEUE_DEPTH, REVIEW_QUEUE_REVIEWS
+from app.utils.ratings import apply_rating_change
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# Attempts at writing a batch when the database is briefly unavailable
+FLUSH_ATTEMPTS = 3
+FLUSH_RETRY_DELAY = 0.5
+
+
+def _transient(error: Exception) -> bool:
+    """Whether retrying the same write may succeed (lost connection, timeout...)."""
+    if isinstance(error, (OperationalError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+async def insert_reviews(db, reviews) -> list:
+    """Insert validated `PostReviews` with one multi-row INSERT, skipping reviews of
+    books that don't exist, and apply their rating changes and cache tags.
+
+    Returns the new id of every review in input order, None for skipped ones.
+    Doesn't commit.
+    """
+    query = await db.execute(select(Books.id).where(Books.id.in_({review.book_id for review in reviews})))
+    known_books = set(query.scalars().all())
+    accepted = [review for review in reviews if review.book_id in known_books]
+    if not accepted:
+        return [None] * len(reviews)
+
+    query = await db.execute(
+        insert(Reviews).returning(Reviews.id, sort_by_parameter_order=True),
+        [review.model_dump() for review in accepted]
+    )
+    review_ids = iter(query.scalars().all())
+
+    ratings_by_book = defaultdict(list)
+    for review in accepted:
+        ratings_by_book[review.book_id].append(review.ratings)
+    for book_id, ratings in ratings_by_book.items():
+        await apply_rating_change(db, book_id, added=ratings)
+        record_reviews(db, book_id, count=len(ratings))
+        add_cache_tags(db, f"book:{book_id}", f"book:{book_id}:reviews")
+    add_cache_tags(db, "ratings")
+
+    return [next(review_ids) if review.book_id in known_books else None for review in reviews]
+
+
+class ReviewQueue:
+    """Bounded in-process queue of validated reviews, written by a background task.
+
+    The worker waits for a first review, gathers whatever else arrives within
+    `flush_interval` (up to `batch_size`), and writes the batch in one transaction,
+    so cache versions are bumped once per batch rather than once per review.
+    Transient database errors are retried with backoff, and a batch rejected by a
+    constraint is written again review by review so one bad review can't discard
+    the others.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = None
+        self._worker = None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None
+
+    def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(self.max_size)
+        self._worker = asyncio.create_task(self._run())
+
+    def submit(self, review) -> bool:
+        """Queue `review` for writing; False when the queue is full or not running."""
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(review)
+        except asyncio.QueueFull:
+            REVIEW_QUEUE_REVIEWS.labels("rejected").inc()
+            return False
+        REVIEW_QUEUE_REVIEWS.labels("accepted").inc()
+        REVIEW_QUEUE_DEPTH.inc()
+        return True
+
+    async def stop(self):
+        """Stop accepting reviews and wait until everything queued is written."""
+        if not self.running:
+            return
+        worker, self._worker = self._worker, None
+        await self._queue.put(_STOP)
+        await worker
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not _STOP and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            stopping = batch[-1] is _STOP
+            if stopping:
+                batch.pop()
+            if batch:
+                await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch):
+        REVIEW_QUEUE_DEPTH.dec(len(batch))
+        try:
+            review_ids = await self._write(batch)
+        except IntegrityError as e:
+            logger.warning("Batch of %d queued reviews rejected, writing them one by one: %s", len(batch), e)
+            review_ids = []
+            for review in batch:
+                try:
+                    review_ids.extend(await self._write([review]))
+                except Exception as e:
+                    REVIEW_QUEUE_REVIEWS.labels("failed").inc()
+                    logger.error("Failed to write queued review of book %s: %s", review.book_id, e)
+        except Exception as e:
+            REVIEW_QUEUE_REVIEWS.labels("failed").inc(len(batch))
+            logger.error("Failed to write %d queued reviews: %s", len(batch), e)
+            return
+
+        skipped = review_ids.count(None)
+        REVIEW_QUEUE_REVIEWS.labels("written").inc(len(review_ids) - skipped)
+        if skipped:
+            REVIEW_QUEUE_REVIEWS.labels("skipped").inc(skipped)
+            logger.warning("Skipped %d queued reviews of books that don't exist", skipped)
+
+    async def _write(self, reviews) -> list:
+        """`insert_reviews` in its own transaction, retrying transient errors."""
+        for attempt in range(FLUSH_ATTEMPTS):
+            try:
+                async with SessionLocal() as db:
+                    review_ids = await insert_reviews(db, reviews)
+                    await db.commit()
+                return review_ids
+            except Exception as e:
+                if not _transient(e) or attempt == FLUSH_ATTEMPTS - 1:
+                    raise
+                delay = FLUSH_RETRY_DELAY * 2 ** attempt
+                logger.warning("Writing %d queued reviews failed, retrying in %.1fs: %s", len(reviews), delay, e)
+                await asyncio.sleep(delay)
+
+
+review_queue = ReviewQueue(
+    settings.REVIEW_QUEUE_MAX_SIZE,
+    settings.REVIEW_QUEUE_BATCH_SIZE,
+    settings.REVIEW_QUEUE_FLUSH_INTERVAL,
+)
@@ -0,0 +1,69 @@
+from sqlalchemy import select, func, or_, case, literal, literal_column
+from app.db.models.books import Books
+
+SEARCH_COLUMNS = (
+    Books.id.label("id"),
+    Books.book_name.label("name"),
+    Books.author.label("author"),
+    Books.description.label("description"),
+    Books.language.label("language"),
+)
+
+# Generated tsvector column, created by the 'add books search' migration and
+# deliberately not mapped on Books so plain book queries never load it
+search_vector = literal_column("books.search_vector")
+search_config = literal_column("'simple'::regconfig")
+
+
+def _like_prefix(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%"
+
+
+def _postgres_search(text: str, mode: str):
+    if mode == "prefix":
+        # Typo tolerant autocomplete: prefix matches first, then trigram similarity
+        prefix = _like_prefix(text)
+        is_prefix = or_(Books.book_name.ilike(prefix, escape="\\"), Books.author.ilike(prefix, escape="\\"))
+        similarity = func.greatest(func.similarity(Books.book_name, text), func.similarity(Books.author, text))
+        return (
+            select(*SEARCH_COLUMNS, similarity.label("score"))
+            .where(or_(is_prefix, Books.book_name.op("%")(text), Books.author.op("%")(text)))
+            .order_by(case((is_prefix, 0), else_=1), similarity.desc(), Books.id)
+        )
+
+    query = func.websearch_to_tsquery(search_config, text)
+    rank = func.ts_rank_cd(search_vector, query)
+    return (
+        select(*SEARCH_COLUMNS, rank.label("score"))
+        .where(search_vector.op("@@")(query))
+        .order_by(rank.desc(), Books.id)
+    )
+
+
+def _fallback_search(text: str, mode: str):
+    """Unranked LIKE matching for databases without tsvector/pg_trgm, e.g. SQLite in tests."""
+    if mode == "prefix":
+        prefix = _like_prefix(text.lower())
+        condition = or_(
+            func.lower(Books.book_name).like(prefix, escape="\\"),
+            func.lower(Books.author).like(prefix, escape="\\"),
+        )
+    else:
+        condition = literal(True)
+        for term in text.lower().split():
+            pattern = "%" + _like_prefix(term)
+            condition = condition & or_(
+                func.lower(Books.book_name).like(pattern, escape="\\"),
+                func.lower(Books.author).like(pattern, escape="\\"),
+                func.lower(func.coalesce(Books.description, "")).like(pattern, escape="\\"),
+            )
+    return select(*SEARCH_COLUMNS, literal(None).label("score")).where(condition).order_by(Books.id)
+
+
+def search_statement(dialect_name: str, text: str, mode: str, limit: int):
+    if dialect_name == "postgresql":
+        statement = _postgres_search(text, mode)
+    else:
+        statement = _fallback_search(text, mode)
+    return statement.limit(limit)
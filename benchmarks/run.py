@@ -0,0 +1,264 @@
+"""Seed a local database and run scripted workloads against the API in-process.
+
+Usage:
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.run --books 2000 --reviews-per-book 20 --requests 2000 --concurrency 32
+
+Requests go through httpx's ASGI transport, so the numbers cover the app
+(routing, cache, ORM, serialization) without network noise. By default the
+database is a fresh SQLite file and Redis is replaced by fakeredis; pass
+--database-url/--redis-url to run against local Postgres/Redis instead.
+Results are printed and written as JSON to benchmarks/results/ so runs can be
+compared.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+WORKLOADS = ("read-heavy", "write-heavy", "cache-cold", "cache-warm")
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the books/reviews API in-process")
+    parser.add_argument("--books", type=int, default=1000)
+    parser.add_argument("--reviews-per-book", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per workload")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="Comma separated subset of " + ", ".join(WORKLOADS))
+    parser.add_argument("--database-url", help="Defaults to a fresh SQLite file; the schema is created if missing")
+    parser.add_argument("--redis-url", help="Defaults to an in-process fakeredis")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON results path, defaults to benchmarks/results/<timestamp>.json")
+    return parser.parse_args()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, statuses, elapsed):
+    endpoints = {}
+    for endpoint, values in latencies.items():
+        values = sorted(values)
+        endpoints[endpoint] = {
+            "requests": len(values),
+            "errors": sum(1 for status in statuses[endpoint] if status >= 400),
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        }
+    total = sum(len(values) for values in latencies.values())
+    return {"requests": total, "elapsed_s": round(elapsed, 3), "throughput_rps": round(total / elapsed, 2), "endpoints": endpoints}
+
+
+class Benchmark:
+    def __init__(self, args, app, cache):
+        self.args = args
+        self.app = app
+        self.cache = cache
+        self.random = random.Random(args.seed)
+        self.review_ids = []
+
+    def hot_book_id(self):
+        # Skewed towards low ids, like real catalogue traffic
+        return min(self.args.books, int(self.random.paretovariate(1.16)))
+
+    def any_book_id(self):
+        return self.random.randint(1, self.args.books)
+
+    # Operations return (endpoint label, method, url, json body)
+    def get_book(self, book_id=None):
+        book_id = book_id or self.hot_book_id()
+        return "GET /api/books?book_id", "GET", f"/api/books/?book_id={book_id}", None
+
+    def list_books(self):
+        return "GET /api/books (page)", "GET", "/api/books/?limit=50", None
+
+    def book_reviews(self):
+        return "GET /api/books/{id}/reviews", "GET", f"/api/books/{self.hot_book_id()}/reviews?limit=20", None
+
+    def post_review(self):
+        body = {"book_id": self.hot_book_id(), "ratings": self.random.randint(1, 5), "review": "benchmark review", "reviewer_name": "bench"}
+        return "POST /api/reviews", "POST", "/api/reviews/", body
+
+    def patch_review(self):
+        body = {"review_id": self.random.choice(self.review_ids), "ratings": self.random.randint(1, 5)}
+        return "PATCH /api/reviews", "PATCH", "/api/reviews/", body
+
+    def operations(self, workload):
+        count = self.args.requests
+        if workload == "read-heavy":
+            choices = [(self.get_book, 0.85), (self.list_books, 0.05), (self.book_reviews, 0.10)]
+        elif workload == "write-heavy":
+            choices = [(self.post_review, 0.5), (self.patch_review, 0.3), (self.get_book, 0.2)]
+        elif workload == "cache-cold":
+            book_ids = list(range(1, self.args.books + 1))
+            self.random.shuffle(book_ids)
+            return [self.get_book(book_ids[i % len(book_ids)]) for i in range(count)]
+        else:
+            hot = [self.any_book_id() for _ in range(min(100, self.args.books))]
+            return [self.get_book(self.random.choice(hot)) for _ in range(count)]
+
+        functions, weights = zip(*choices)
+        return [self.random.choices(functions, weights)[0]() for _ in range(count)]
+
+    async def reset_cache(self):
+        await self.cache.redis_client.flushdb()
+        self.cache.local_cache.clear()
+
+    async def run_workload(self, client, workload):
+        await self.reset_cache()
+        operations = self.operations(workload)
+        if workload == "cache-warm":
+            for label, method, url, body in {op[2]: op for op in operations}.values():
+                await client.request(method, url, json=body)
+
+        latencies, statuses = defaultdict(list), defaultdict(list)
+        queue = asyncio.Queue()
+        for operation in operations:
+            queue.put_nowait(operation)
+
+        async def worker():
+            while not queue.empty():
+                label, method, url, body = queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.request(method, url, json=body)
+                latencies[label].append(time.perf_counter() - started)
+                statuses[label].append(response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+        return summarize(latencies, statuses, time.perf_counter() - started)
+
+
+async def seed(args, rng):
+    from sqlalchemy import insert, select, func
+    from app.db.base import Base
+    from app.db.models.books import Books
+    from app.db.models.reviews import Reviews
+    from app.db.session import engine
+    import app.db.models  # noqa: F401
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        existing = (await conn.execute(select(func.count(Books.id)))).scalar()
+        if existing:
+            print(f"Database already has {existing} books, skipping seeding")
+            return
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        batch = 1000
+        for start in range(0, args.books, batch):
+            books, reviews = [], []
+            for book_id in range(start + 1, min(args.books, start + batch) + 1):
+                ratings = [rng.randint(1, 5) for _ in range(args.reviews_per_book)]
+                book = {
+                    "id": book_id, "book_name": f"Book {book_id}", "author": f"Author {book_id % 997}",
+                    "description": f"Description of book {book_id}", "language": "en",
+                    "created_at": now, "updated_at": now,
+                    "review_count": len(ratings), "rating_sum": sum(ratings),
+                }
+                for rating in range(1, 6):
+                    book[f"rating_{rating}_count"] = ratings.count(rating)
+                books.append(book)
+                reviews.extend(
+                    {"book_id": book_id, "ratings": rating, "review": "Seeded review", "reviewer_name": "seed",
+                     "created_at": now, "updated_at": now}
+                    for rating in ratings
+                )
+            await conn.execute(insert(Books), books)
+            if reviews:
+                await conn.execute(insert(Reviews), reviews)
+    print(f"Seeded {args.books} books and {args.books * args.reviews_per_book} reviews")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main():
+    args = parse_args()
+    workloads = [workload.strip() for workload in args.workloads.split(",") if workload.strip()]
+    unknown = set(workloads) - set(WORKLOADS)
+    if unknown:
+        sys.exit(f"Unknown workloads: {', '.join(sorted(unknown))}")
+
+    database_url = args.database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/benchmark.db"
+    # Settings are read at import time, so configure the environment first
+    os.environ["DATABASE_URL"] = database_url
+    # Measure the API, not the admission control in front of it
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    import httpx
+    from sqlalchemy import select
+    import app.utils.cache as cache
+    from app.db.models.reviews import Reviews
+    from app.db.session import engine
+    from app.main import app
+
+    if args.redis_url:
+        import redis.asyncio as redis
+        cache.redis_client = redis.Redis.from_url(args.redis_url)
+    else:
+        import fakeredis
+        cache.redis_client = fakeredis.FakeAsyncRedis()
+
+    rng = random.Random(args.seed)
+    await seed(args, rng)
+
+    benchmark = Benchmark(args, app, cache)
+    async with engine.connect() as conn:
+        benchmark.review_ids = (await conn.execute(select(Reviews.id).limit(10000))).scalars().all()
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for workload in workloads:
+            if workload == "write-heavy" and not benchmark.review_ids:
+                print("Skipping write-heavy: no reviews to update, use --reviews-per-book > 0")
+                continue
+            results[workload] = await benchmark.run_workload(client, workload)
+            summary = results[workload]
+            print(f"\n{workload}: {summary['requests']} requests in {summary['elapsed_s']} s ({summary['throughput_rps']} req/s)")
+            for endpoint, stats in summary["endpoints"].items():
+                print(
+                    f"  {endpoint:<32} n={stats['requests']:<6} err={stats['errors']:<4} "
+                    f"p50={stats['p50_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms"
+                )
+    await engine.dispose()
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "database": "sqlite" if database_url.startswith("sqlite") else database_url.split(":", 1)[0],
+        "redis": "redis" if args.redis_url else "fakeredis",
+        "config": {key: value for key, value in vars(args).items() if key not in ("database_url", "redis_url", "output")},
+        "results": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())